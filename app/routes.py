@@ -999,9 +999,8 @@ def register_routes(app):
         if '..' in filename or filename.startswith('/'):
             abort(404)
         
+        # 文件不存在时 send_from_directory 会直接返回 404，无需先 stat 一次
         filepath = IMAGE_CACHE_DIR / filename
-        if not filepath.exists():
-            abort(404)
         
         ext = filepath.suffix.lower()
         mime_types = {
@@ -1021,9 +1020,8 @@ def register_routes(app):
         if '..' in filename or filename.startswith('/'):
             abort(404)
         
+        # 文件不存在时 send_from_directory 会直接返回 404，无需先 stat 一次
         filepath = VIDEO_CACHE_DIR / filename
-        if not filepath.exists():
-            abort(404)
         
         mime_type = mimetypes.guess_type(str(filepath))[0] or 'application/octet-stream'
         return send_from_directory(VIDEO_CACHE_DIR, filename, mimetype=mime_type)
@@ -2103,7 +2101,7 @@ def register_routes(app):
         if not proxy_url:
             return jsonify({"success": False, "message": "未配置代理地址"})
         
-        available = check_proxy(proxy_url)
+        available = check_proxy(proxy_url, use_cache=False)
         return jsonify({
             "success": available,
             "message": "代理可用" if available else "代理不可用或连接超时"
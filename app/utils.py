@@ -1,22 +1,37 @@
 """工具函数模块"""
 
+import time
 import requests
 from typing import Optional
 
 from .exceptions import AccountAuthError, AccountRateLimitError, AccountRequestError
 
 
-def check_proxy(proxy: str) -> bool:
-    """检测代理是否可用"""
+# 代理检测结果缓存：{proxy: (检测时间, 是否可用)}，/v1/status 等频繁调用时复用最近的结果
+PROXY_CHECK_TTL = 60  # 秒
+_proxy_check_cache = {}
+
+
+def check_proxy(proxy: str, use_cache: bool = True) -> bool:
+    """检测代理是否可用
+    
+    默认复用 PROXY_CHECK_TTL 秒内的检测结果；手动测试代理时传 use_cache=False 强制重新检测。
+    """
     if not proxy:
         return False
+    if use_cache:
+        cached = _proxy_check_cache.get(proxy)
+        if cached and time.time() - cached[0] < PROXY_CHECK_TTL:
+            return cached[1]
     try:
         proxies = {"http": proxy, "https": proxy}
         resp = requests.get("https://www.google.com", proxies=proxies, 
                           verify=False, timeout=10)
-        return resp.status_code == 200
+        available = resp.status_code == 200
     except:
-        return False
+        available = False
+    _proxy_check_cache[proxy] = (time.time(), available)
+    return available
 
 
 def get_proxy() -> Optional[str]:
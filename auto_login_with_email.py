@@ -4,14 +4,32 @@
 """
 
 import json
+import logging
+import os
+import sys
 import time
 import re
 import base64
+import contextlib
+import itertools
 import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Optional, Dict
 from urllib.parse import urlparse
 
+# 统一日志：默认 INFO，设置环境变量 LOGIN_DEBUG=1 时输出调试信息
+logger = logging.getLogger("auto_login")
+logger.setLevel(logging.DEBUG if os.environ.get("LOGIN_DEBUG") == "1" else logging.INFO)
+if not logger.handlers:
+    _log_handler = logging.StreamHandler(sys.stdout)
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_log_handler)
+    logger.propagate = False
+
 # 注意：这个脚本需要使用 chrome-mcp 工具
 # 由于无法直接调用 chrome-mcp，这里提供使用 Playwright 的实现
 # 实际使用时可以通过 chrome-mcp 的 API 调用
@@ -35,10 +53,319 @@ TEMPMAIL_SELECTION_STRATEGY = 'round_robin'
 
 # 当前使用的邮箱索引（用于轮换）
 _current_tempmail_index = 0
+# 并发批量刷新时保护邮箱轮换索引、客户端缓存和最近验证码邮件记录
+_tempmail_state_lock = threading.Lock()
+# 每个临时邮箱一把锁：同一邮箱同一时间只允许一个账号登录，避免一个账号取走另一个账号的验证码
+_tempmail_mailbox_locks = {}
 
 GEMINI_LOGIN_URL = "https://auth.business.gemini.google/login?continueUrl=https://business.gemini.google/"
 GETOXSRF_URL = "https://business.gemini.google/auth/getoxsrf"
 
+# 在页面内解析 document.cookie，只返回会话相关的 Cookie
+DOC_COOKIE_JS = """() => {
+    const o = {};
+    for (const kv of document.cookie.split('; ')) {
+        const i = kv.indexOf('=');
+        const k = kv.slice(0, i);
+        if (k === '__Secure-C_SES' || k === '__Host-C_OSES') o[k] = kv.slice(i + 1);
+    }
+    return o;
+}"""
+
+
+# 注入到每个浏览器上下文的反检测脚本（隐藏自动化特征，更好地绕过 reCAPTCHA）
+FINGERPRINT_INIT_JS = """
+    // 覆盖 navigator.webdriver
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // 覆盖 chrome 对象
+    window.chrome = {
+        runtime: {},
+        loadTimes: function() {},
+        csi: function() {},
+        app: {}
+    };
+
+    // 覆盖 permissions
+    const originalQuery = window.navigator.permissions.query;
+    window.navigator.permissions.query = (parameters) => (
+        parameters.name === 'notifications' ?
+            Promise.resolve({ state: Notification.permission }) :
+            originalQuery(parameters)
+    );
+
+    // 覆盖 plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    // 覆盖 languages
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['zh-CN', 'zh', 'en']
+    });
+
+    // 覆盖 webdriver 相关属性
+    delete navigator.__proto__.webdriver;
+
+    // 覆盖 getBattery
+    if (navigator.getBattery) {
+        navigator.getBattery = () => Promise.resolve({
+            charging: true,
+            chargingTime: 0,
+            dischargingTime: Infinity,
+            level: 1
+        });
+    }
+
+    // 覆盖 connection
+    Object.defineProperty(navigator, 'connection', {
+        get: () => ({
+            effectiveType: '4g',
+            rtt: 50,
+            downlink: 10,
+            saveData: false
+        })
+    });
+
+    // 覆盖 hardwareConcurrency
+    Object.defineProperty(navigator, 'hardwareConcurrency', {
+        get: () => 8
+    });
+
+    // 覆盖 deviceMemory
+    Object.defineProperty(navigator, 'deviceMemory', {
+        get: () => 8
+    });
+
+    // 覆盖 canvas 指纹
+    const originalToDataURL = HTMLCanvasElement.prototype.toDataURL;
+    HTMLCanvasElement.prototype.toDataURL = function(type) {
+        if (type === 'image/png') {
+            return originalToDataURL.apply(this, arguments);
+        }
+        return originalToDataURL.apply(this, arguments);
+    };
+
+    // 覆盖 WebGL 指纹
+    const getParameter = WebGLRenderingContext.prototype.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(parameter) {
+        if (parameter === 37445) {
+            return 'Intel Inc.';
+        }
+        if (parameter === 37446) {
+            return 'Intel Iris OpenGL Engine';
+        }
+        return getParameter.apply(this, arguments);
+    };
+"""
+
+# 发送验证码邮件的接口（响应成功即说明邮件已发出）
+SEND_CODE_RESPONSE_PATTERN = re.compile(r"(sendOobCode|sendVerificationCode)")
+# 点击"继续"后等待发送接口响应或跳转到验证码页面的最长时间（毫秒），两者都没有时再回退到 reCAPTCHA 检查
+SEND_CODE_RESPONSE_TIMEOUT_MS = 10000
+
+# "重新发送验证码"按钮的选择器（逗号联合，一次查询覆盖中英文文案）
+# 只匹配可见且可用的按钮，与 RESEND_BTN_READY_JS 的判断条件一致，等待通过后点击的就是被判断的那个按钮
+RESEND_BTN_SELECTOR = (
+    "button[aria-label*='重新发送']:enabled, button[aria-label*='Resend']:enabled,"
+    " button:enabled:has-text('重新发送'), button:enabled:has-text('Resend')"
+    " >> visible=true"
+)
+
+# 页面内判断"重新发送验证码"按钮是否已出现且可用（EMAIL_SENT_SIGNAL_JS 也复用这段判断）
+RESEND_BTN_READY_JS = """() => [...document.querySelectorAll('button')].some(b => {
+    const t = (b.textContent || '') + (b.getAttribute('aria-label') || '');
+    return /重新发送|Resend/.test(t) && !b.disabled && b.offsetParent !== null;
+})"""
+
+# 验证码页面的提示框选择器和提示文本（成功提示需同时包含两段文本，错误提示同理）
+TOAST_ASIDE_SELECTOR = "aside.zyTWof-Ng57nc"
+TOAST_SELECTOR = "aside.zyTWof-Ng57nc, div.zyTWof-gIZMF"
+TOAST_SENT_DIV_SELECTOR = "aside.zyTWof-Ng57nc div.zyTWof-gIZMF"
+EMAIL_SENT_TEXTS = ("验证码已发送", "请查收您的邮件")
+EMAIL_ERROR_TEXTS = ("出了点问题", "请稍后再试")
+# 成功提示的正则（两段文本任意先后），用于 locator.filter(has_text=...) 在浏览器内一次匹配
+EMAIL_SENT_TEXT_RE = re.compile("{0}.*{1}|{1}.*{0}".format(*EMAIL_SENT_TEXTS), re.S)
+
+def _js_includes_all(texts) -> str:
+    """生成页面内判断变量 t 同时包含所有文本（任意先后）的 JS 表达式：一个正则字面量，每个元素只匹配一次"""
+    alternatives = "|".join(r"[\s\S]*".join(order) for order in itertools.permutations(texts))
+    return f"/{alternatives}/.test(t)"
+
+# 页面内扫描可见的提示框（aside / div.zyTWof-gIZMF），返回成功和错误提示文本；都没有时返回 null
+TOAST_STATE_JS = """() => {
+    let sent = '', error = '';
+    for (const el of document.querySelectorAll('%(selector)s')) {
+        if (!el.getClientRects().length) continue;
+        const t = el.textContent || '';
+        if (!sent && %(sent)s) sent = t.slice(0, 200);
+        if (!error && %(error)s) error = t.slice(0, 200);
+    }
+    return (sent || error) ? {sent, error} : null;
+}""" % {
+    "selector": TOAST_SELECTOR,
+    "sent": _js_includes_all(EMAIL_SENT_TEXTS),
+    "error": _js_includes_all(EMAIL_ERROR_TEXTS),
+}
+
+# reCAPTCHA iframe / 容器
+RECAPTCHA_FRAME_SELECTOR = "iframe[src*='recaptcha'], iframe[title*='reCAPTCHA'], #recaptcha-container"
+
+# 页面内判断验证码邮件是否已发送：提示框文本优先，其次是可用的"重新发送验证码"按钮
+EMAIL_SENT_SIGNAL_JS = """() => {
+    const isSent = t => %(sent)s;
+    for (const el of document.querySelectorAll('%(selector)s')) {
+        if (isSent(el.textContent || '')) return 'toast';
+    }
+    const resendReady = %(resend_ready)s;
+    return resendReady() ? 'resend' : null;
+}""" % {
+    "selector": TOAST_SELECTOR,
+    "sent": _js_includes_all(EMAIL_SENT_TEXTS),
+    "resend_ready": RESEND_BTN_READY_JS,
+}
+
+# 在验证码页面安装 MutationObserver：DOM 变化时才执行 EMAIL_SENT_SIGNAL_JS，结果写入 window.__emailSentSignal；
+# 同时记录错误提示（出了点问题）首次出现的时间，提示消失时清零
+EMAIL_SENT_OBSERVER_JS = """() => {
+    if (window.__emailSentObs) return;
+    const check = %(signal)s;
+    const hasError = () => [...document.querySelectorAll('%(selector)s')].some(el => {
+        const t = el.textContent || '';
+        return %(error)s;
+    });
+    const update = () => {
+        const signal = check();
+        if (signal) {
+            window.__emailSentSignal = signal;
+            window.__emailSentObs.disconnect();
+            return;
+        }
+        if (!hasError()) window.__emailErrorSince = 0;
+        else if (!window.__emailErrorSince) window.__emailErrorSince = Date.now();
+    };
+    window.__emailSentObs = new MutationObserver(update);
+    window.__emailSentObs.observe(document.body, {
+        childList: true, subtree: true, characterData: true,
+        attributes: true, attributeFilter: ['disabled', 'class', 'style'],
+    });
+    update();
+}""" % {
+    "signal": EMAIL_SENT_SIGNAL_JS,
+    "selector": TOAST_SELECTOR,
+    "error": _js_includes_all(EMAIL_ERROR_TEXTS),
+}
+
+# 错误提示持续这么久仍没有出现"已发送"信号时不再等待
+EMAIL_ERROR_PERSIST_MS = 8000
+
+# 等待 observer 的结果：已发送信号，或错误提示持续超过 EMAIL_ERROR_PERSIST_MS 时返回 'error'
+EMAIL_SENT_OR_ERROR_JS = """() => window.__emailSentSignal
+    || (window.__emailErrorSince && Date.now() - window.__emailErrorSince > %d ? 'error' : null)""" % EMAIL_ERROR_PERSIST_MS
+
+# 页面内判断 reCAPTCHA 令牌是否已写入
+RECAPTCHA_TOKEN_JS = "() => (document.getElementsByName('g-recaptcha-response')[0]?.value || '').length > 0"
+
+# 登录流程中不需要的请求（统计、字体、装饰性图片），在浏览器上下文中直接拦截
+BLOCKED_RESOURCE_PATTERN = re.compile(r"(google-analytics|googletagmanager|\.woff2?(\?|$)|logo_48\.png|info_2x\.png)")
+
+# 邮箱输入框 / 验证码输入框的选择器（逗号联合，一次查询覆盖所有候选）
+EMAIL_INPUT_SELECTOR = "#email-input, input[aria-label='邮箱'], input[type='text'][name='loginHint']"
+CODE_INPUT_SELECTOR = ", ".join([
+    "input[name='pinInput']",
+    "input[type='text'][placeholder*='code' i]",
+    "input[placeholder*='验证码' i]",
+    "input[name='code']",
+    "input[autocomplete='one-time-code']",
+])
+
+# 调试日志用的页面文本预览：在页面内截断，只传回前 500 个字符
+BODY_TEXT_PREVIEW_JS = "() => (document.body.innerText || '').slice(0, 500)"
+
+# 页面内判断"继续"按钮是否已可点击（填写邮箱后由表单校验启用）
+CONTINUE_BTN_ENABLED_JS = "() => { const b = document.querySelector('button#log-in-button'); return !!b && !b.disabled; }"
+
+# 登录发起频率限制：每 60 秒最多 LOGIN_RATE_LIMIT 次（并发批量刷新时所有线程共享）
+LOGIN_RATE_LIMIT = 6
+_login_start_times = deque()
+_login_rate_lock = threading.Lock()
+
+# 并发刷新时保护配置写入
+_config_save_lock = threading.Lock()
+
+def acquire_login_slot():
+    """发起登录前调用，超出频率限制时阻塞等待"""
+    while True:
+        with _login_rate_lock:
+            now = time.time()
+            while _login_start_times and now - _login_start_times[0] >= 60:
+                _login_start_times.popleft()
+            if len(_login_start_times) < LOGIN_RATE_LIMIT:
+                _login_start_times.append(now)
+                return
+            wait_seconds = 60 - (now - _login_start_times[0])
+        time.sleep(max(wait_seconds, 0.1))
+
+# 验证码页面"已发送"信号的等待时长记录，用于按实际延迟调整 max_wait_sent
+# 默认放在 log 目录（与 app.log 相同，docker-compose 中已挂载为持久化卷），可通过环境变量 LOGIN_TIMINGS_FILE 指定路径
+LOGIN_TIMINGS_FILE = Path(os.environ.get("LOGIN_TIMINGS_FILE") or Path(__file__).parent / "log" / "login_timings.json")
+LOGIN_TIMINGS_MAX_SAMPLES = 200
+# 样本数达到这个数量后才按历史记录调整等待时间，避免少数几次很快的登录把等待时间压到下限
+LOGIN_TIMINGS_MIN_SAMPLES = 20
+DEFAULT_MAX_WAIT_SENT = 90
+_login_timings_lock = threading.Lock()
+
+def _load_login_timings() -> list:
+    try:
+        with open(LOGIN_TIMINGS_FILE, "r", encoding="utf-8") as f:
+            timings = json.load(f)
+        return [float(t) for t in timings if isinstance(t, (int, float))]
+    except (OSError, ValueError):
+        return []
+
+def get_max_wait_sent() -> int:
+    """按历史等待时长的 p99 + 5 秒计算"已发送"信号的最长等待时间（样本不足 LOGIN_TIMINGS_MIN_SAMPLES 个时使用 90 秒）"""
+    with _login_timings_lock:
+        timings = sorted(_load_login_timings())
+    if len(timings) < LOGIN_TIMINGS_MIN_SAMPLES:
+        return DEFAULT_MAX_WAIT_SENT
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return min(DEFAULT_MAX_WAIT_SENT, max(10, int(p99 + 5)))
+
+def record_email_sent_wait(seconds: float):
+    """记录一次检测到"已发送"信号所用的时间（只保留最近 LOGIN_TIMINGS_MAX_SAMPLES 条）"""
+    with _login_timings_lock:
+        timings = _load_login_timings()
+        timings.append(round(seconds, 2))
+        try:
+            LOGIN_TIMINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(LOGIN_TIMINGS_FILE, "w", encoding="utf-8") as f:
+                json.dump(timings[-LOGIN_TIMINGS_MAX_SAMPLES:], f)
+        except OSError as e:
+            logger.debug("[登录] 保存等待时长记录失败: %s", e)
+
+def is_verify_page_url(url: str) -> bool:
+    """是否为验证码输入页面（accountverification.business.gemini.google/v1/verify-oob-code）"""
+    return "accountverification" in url and "verify-oob-code" in url
+
+def backoff_delays(start_ms: int = 250, max_ms: int = 5000):
+    """轮询等待间隔（毫秒）：从 start_ms 开始按 1.6 倍递增，最大 max_ms"""
+    delay = start_ms
+    while True:
+        yield delay
+        delay = min(int(delay * 1.6), max_ms)
+
+@dataclass
+class SessionData:
+    """登录后提取的会话数据（只在写入配置时转换为 dict）"""
+    secure_c_ses: str
+    host_c_oses: str = ""
+    csesidx: str = ""
+    team_id: Optional[str] = None
+    tempmail_name: Optional[str] = None
+
 def select_tempmail_url(account_config: Optional[Dict] = None) -> tuple[str, Optional[str]]:
     """选择要使用的临时邮箱 URL
     
@@ -69,12 +396,13 @@ def select_tempmail_url(account_config: Optional[Dict] = None) -> tuple[str, Opt
         # 调试日志已关闭
         # print(f"[临时邮箱] 随机选择邮箱 {selected_index + 1}/{len(TEMPMAIL_URLS)}")
     else:  # round_robin
-        selected_url = TEMPMAIL_URLS[_current_tempmail_index]
-        selected_index = _current_tempmail_index
-        # 调试日志已关闭
-        # print(f"[临时邮箱] 轮换选择邮箱 {selected_index + 1}/{len(TEMPMAIL_URLS)}")
-        # 更新索引，下次使用下一个邮箱
-        _current_tempmail_index = (_current_tempmail_index + 1) % len(TEMPMAIL_URLS)
+        with _tempmail_state_lock:
+            selected_url = TEMPMAIL_URLS[_current_tempmail_index]
+            selected_index = _current_tempmail_index
+            # 调试日志已关闭
+            # print(f"[临时邮箱] 轮换选择邮箱 {selected_index + 1}/{len(TEMPMAIL_URLS)}")
+            # 更新索引，下次使用下一个邮箱
+            _current_tempmail_index = (_current_tempmail_index + 1) % len(TEMPMAIL_URLS)
     
     # 从 URL 中提取邮箱名称（如果有 jwt）
     name = None
@@ -166,6 +494,14 @@ def extract_verification_code(text: str) -> Optional[str]:
     print("[临时邮箱] 未能从邮件文本中提取验证码")
     return None
 
+def open_tempmail_page(page, url: str, timeout: int = 30000):
+    """打开临时邮箱页面：DOM 就绪后等待标签栏渲染即可，不等待 networkidle（页面的轮询请求会让它迟迟不返回）"""
+    page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    try:
+        page.locator("div.n-tabs-tab").first.wait_for(state="visible", timeout=15000)
+    except Exception:
+        pass
+
 def get_email_from_tempmail(page, tempmail_url: str) -> Optional[str]:
     """从临时邮箱服务获取邮箱地址"""
     # 调试日志已关闭
@@ -188,10 +524,8 @@ def get_email_from_tempmail(page, tempmail_url: str) -> Optional[str]:
         
         for selector in tab_selectors:
             try:
-                if selector.startswith("//"):
-                    tab = page.locator(selector).first
-                else:
-                    tab = page.locator(selector).first
+                # 可见性在选择器引擎内过滤，避免 .first 命中隐藏元素后还要逐个 is_visible()
+                tab = page.locator(f"{selector} >> visible=true").first
                 
                 if tab.is_visible():
                     tab_class = tab.get_attribute("class") or ""
@@ -219,10 +553,7 @@ def get_email_from_tempmail(page, tempmail_url: str) -> Optional[str]:
         
         for selector in button_selectors:
             try:
-                if selector.startswith("//"):
-                    button = page.locator(selector).first
-                else:
-                    button = page.locator(selector).first
+                button = page.locator(f"{selector} >> visible=true").first
                 
                 if button.is_visible():
                     button.click()
@@ -324,6 +655,69 @@ except ImportError:
 # 客户端实例缓存（以 tempmail_url 为键，用于在重试时复用 last_max_id）
 _tempmail_client_cache = {}
 
+def _tempmail_mailbox_lock(tempmail_url: str) -> threading.Lock:
+    """获取临时邮箱对应的锁（同一邮箱的登录流程在持有该锁时串行执行）"""
+    with _tempmail_state_lock:
+        return _tempmail_mailbox_locks.setdefault(tempmail_url, threading.Lock())
+
+# 最近一次取到验证码的邮件：{tempmail_url: (获取方式 "api" / "browser", 邮件 ID)}，验证码被拒绝后据此等待更新的邮件
+_last_code_mail = {}
+
+# 临时邮箱页面上的刷新按钮和邮件列表项
+TEMPMAIL_REFRESH_BTN_SELECTOR = "button:has-text('刷新') >> visible=true"
+TEMPMAIL_MAIL_ITEM_SELECTOR = "li.n-list-item"
+# 页面内从邮件列表文本中提取最大的邮件 ID（"ID: 310" 格式）
+MAIL_LIST_MAX_ID_JS = """els => Math.max(0, ...els.map(e => {
+    const m = (e.textContent || '').match(/ID:\\s*(\\d+)/);
+    return m ? parseInt(m[1], 10) : 0;
+}))"""
+# 页面内计算邮件列表指纹（列表项数 + 全部文本的哈希），只有内容完全相同时指纹才相同，用于判断刷新后是否有新邮件
+MAIL_LIST_FINGERPRINT_JS = """els => {
+    let h = 0;
+    for (const e of els) {
+        const t = (e.textContent || '') + '\u0001';
+        for (let i = 0; i < t.length; i++) {
+            h = (Math.imul(h, 31) + t.charCodeAt(i)) | 0;
+        }
+    }
+    return els.length + ':' + h;
+}"""
+
+def _latest_mail_id(email_page, tempmail_url: str, source: str) -> int:
+    """读取临时邮箱当前最新邮件的 ID（API 方式直接请求邮件列表，浏览器方式点击刷新后在页面内读取）"""
+    if source == "api":
+        with _tempmail_state_lock:
+            client = _tempmail_client_cache.get(tempmail_url)
+        mails = client.get_mails(limit=5) if client else []
+        return max((int(mail.get("id", 0) or 0) for mail in mails), default=0)
+    refresh_btn = email_page.locator(TEMPMAIL_REFRESH_BTN_SELECTOR).first
+    if refresh_btn.count():
+        refresh_btn.click(timeout=2000)
+    return email_page.locator(TEMPMAIL_MAIL_ITEM_SELECTOR).evaluate_all(MAIL_LIST_MAX_ID_JS)
+
+def wait_for_newer_mail(email_page, tempmail_url: Optional[str], max_wait: float = 3.0) -> Optional[bool]:
+    """验证码被拒绝后，等待比上次取到验证码的邮件更新的邮件出现（最多 max_wait 秒）
+    
+    Returns:
+        True: 已出现更新的邮件；False: 等待超时；None: 不知道上次使用的邮件 ID，无法判断
+    """
+    with _tempmail_state_lock:
+        last = _last_code_mail.get(tempmail_url) if tempmail_url else None
+    if not last or not last[1]:
+        return None
+    source, last_mail_id = last
+    deadline = time.time() + max_wait
+    for delay in backoff_delays(start_ms=200, max_ms=800):
+        try:
+            if _latest_mail_id(email_page, tempmail_url, source) > last_mail_id:
+                return True
+        except Exception as e:
+            logger.debug("[临时邮箱] 检查新邮件时出错: %s", e, exc_info=True)
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay / 1000, remaining))
+
 def get_verification_code_from_tempmail(page, timeout=120, tempmail_url: Optional[str] = None, retry_mode: bool = False, account_config: Optional[Dict] = None, force_api: bool = False) -> Optional[str]:
     """从临时邮箱服务获取验证码（自动选择 API 或浏览器方式）
     
@@ -355,16 +749,16 @@ def get_verification_code_from_tempmail(page, timeout=120, tempmail_url: Optiona
                 pass
             
             # 使用缓存来复用客户端实例（以便在重试时保持 last_max_id）
-            client = None
-            if tempmail_url in _tempmail_client_cache:
-                client = _tempmail_client_cache[tempmail_url]
-            else:
+            with _tempmail_state_lock:
+                client = _tempmail_client_cache.get(tempmail_url)
+            if client is None:
                 try:
                     from app.tempmail_api import TempMailAPIClient
                     client = TempMailAPIClient(tempmail_url, worker_url)
                     api_email = client.get_email_address()
-                    # 缓存客户端实例
-                    _tempmail_client_cache[tempmail_url] = client
+                    # 缓存客户端实例（并发创建时保留先写入的实例）
+                    with _tempmail_state_lock:
+                        client = _tempmail_client_cache.setdefault(tempmail_url, client)
                     # if api_email:
                     #     print(f"[临时邮箱 API] 从 JWT 提取的邮箱地址: {api_email}")
                     # else:
@@ -390,6 +784,9 @@ def get_verification_code_from_tempmail(page, timeout=120, tempmail_url: Optiona
                     worker_url=worker_url
                 )
             if code:
+                if client:
+                    with _tempmail_state_lock:
+                        _last_code_mail[tempmail_url] = ("api", client.last_max_id)
                 return code
             if force_api:
                 print("[临时邮箱] API 方式未获取到验证码（强制 API 模式，不回退到浏览器方式）")
@@ -435,8 +832,7 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
             if tempmail_url not in current_url:
                 # 调试日志已关闭
                 # print("[临时邮箱] 当前页面不在临时邮箱 URL，重新导航...")
-                page.goto(tempmail_url, wait_until="networkidle", timeout=60000)
-                page.wait_for_timeout(3000)
+                open_tempmail_page(page, tempmail_url, timeout=60000)
         except:
             pass
     
@@ -451,10 +847,7 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
     mailbox_tab_found = False
     for selector in mailbox_tab_selectors:
         try:
-            if selector.startswith("//"):
-                mailbox_tab = page.locator(selector).first
-            else:
-                mailbox_tab = page.locator(selector).first
+            mailbox_tab = page.locator(f"{selector} >> visible=true").first
             
             if mailbox_tab.is_visible():
                 tab_class = mailbox_tab.get_attribute("class") or ""
@@ -479,15 +872,28 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
     
     start_time = time.time()
     attempts = 0
-    if retry_mode:
-        # 重试模式：只尝试一次，不等待
-        max_attempts = 1
-    else:
-        # 正常模式：等待邮件到达
-        max_attempts = timeout // 10
+    # 每轮刷新后的等待时间从 3 秒开始递增到 10 秒：邮件通常几秒内到达，慢的时候也不会频繁刷新
+    settle_delays = backoff_delays(start_ms=3000, max_ms=10000)
     last_max_id = 0  # 记录上一次看到的最高ID，确保只处理真正的新邮件
     
-    while attempts < max_attempts:
+    refresh_selectors = [
+        "button:has-text('刷新')",
+        "//button[contains(., '刷新')]",
+        "//span[contains(text(), '刷新')]/parent::button",
+    ]
+    email_list_selectors = [
+        "li.n-list-item",
+        ".n-list-item",
+        "//li[contains(@class, 'n-list-item')]",
+    ]
+    # 记住上一轮命中的选择器，下一轮先试它，失效时再回退到完整列表
+    refresh_selector_hit = None
+    email_list_selector_hit = None
+    # 上一轮没有找到可用验证码邮件时的列表指纹（邮件数 + 文本总长度）
+    idle_list_fingerprint = None
+    
+    # 重试模式只尝试一次；正常模式在 timeout 内持续刷新直到邮件到达
+    while attempts == 0 or (not retry_mode and time.time() - start_time < timeout):
         attempts += 1
         elapsed = int(time.time() - start_time)
         # 调试日志已关闭
@@ -500,19 +906,10 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
             page.wait_for_timeout(10000)  # 等待 10 秒，确保验证码邮件已发送
         
         # 点击刷新按钮（每次循环都刷新）
-        refresh_selectors = [
-            "button:has-text('刷新')",
-            "//button[contains(., '刷新')]",
-            "//span[contains(text(), '刷新')]/parent::button",
-        ]
-        
         refresh_clicked = False
-        for selector in refresh_selectors:
+        for selector in sorted(refresh_selectors, key=lambda sel: sel != refresh_selector_hit):
             try:
-                if selector.startswith("//"):
-                    refresh_btn = page.locator(selector).first
-                else:
-                    refresh_btn = page.locator(selector).first
+                refresh_btn = page.locator(f"{selector} >> visible=true").first
                 
                 if refresh_btn.is_visible():
                     refresh_btn.click()
@@ -521,6 +918,7 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                         # print("[临时邮箱] ✓ 已点击刷新按钮")
                         pass
                     refresh_clicked = True
+                    refresh_selector_hit = selector
                     break
             except:
                 continue
@@ -535,48 +933,48 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
             # 调试日志已关闭
             # print("[临时邮箱] 等待邮件列表加载...")
             pass
-        page.wait_for_timeout(5000)  # 先等待5秒让刷新生效
-        # 再等待一下，确保新邮件真正出现在列表中
-        page.wait_for_timeout(5000)
+        page.wait_for_timeout(next(settle_delays))  # 等待刷新生效、新邮件出现在列表中
         
-        # 查找邮件列表（参考 jmzc 的选择器）
-        email_list_selectors = [
-            "li.n-list-item",
-            ".n-list-item",
-            "//li[contains(@class, 'n-list-item')]",
-        ]
+        # 列表指纹与上一轮（没有找到验证码邮件）相同，说明刷新后没有新邮件，跳过逐封读取文本
+        list_fingerprint = None
+        if email_list_selector_hit:
+            try:
+                list_fingerprint = page.locator(email_list_selector_hit).evaluate_all(MAIL_LIST_FINGERPRINT_JS)
+            except:
+                pass
+        if list_fingerprint is not None and list_fingerprint == idle_list_fingerprint:
+            continue
         
-        mail_items = []
-        for selector in email_list_selectors:
+        # 查找邮件列表（参考 jmzc 的选择器）
+        mail_list = None
+        for selector in sorted(email_list_selectors, key=lambda sel: sel != email_list_selector_hit):
             try:
-                if selector.startswith("//"):
-                    mail_items = page.locator(selector).all()
-                else:
-                    mail_items = page.locator(selector).all()
-                if len(mail_items) > 0:
-                    if attempts == 1:
-                        # 调试日志已关闭
-                        # print(f"[临时邮箱] ✓ 找到 {len(mail_items)} 封邮件")
-                        pass
+                if page.locator(selector).count() > 0:
+                    mail_list = page.locator(selector)
+                    email_list_selector_hit = selector
                     break
             except:
                 continue
         
         # 查找包含关键词的邮件（参考 jmzc 的关键词），并按 ID 选择最新的一封
+        # 关键词过滤在页面内一次完成，只把命中的 [序号, 文本] 传回 Python（元素中途消失也不会抛异常）
         keywords = ['gemini', 'google', 'verify', 'verification', 'code', '验证', '验证码']
         candidates = []
-        for mail_item in mail_items:
-            try:
-                mail_text = mail_item.text_content() or ""
-                if any(keyword.lower() in mail_text.lower() for keyword in keywords):
-                    # 尝试从文本中提取 ID（支持 "ID: 310" 或跨行格式）
-                    # 使用多行模式匹配，因为 ID 可能在单独一行
-                    id_match = re.search(r'ID:\s*(\d+)', mail_text, re.MULTILINE)
-                    mail_id = int(id_match.group(1)) if id_match else -1
-                    if mail_id > 0:  # 只添加成功提取到 ID 的邮件
-                        candidates.append((mail_id, mail_item, mail_text))
-            except:
-                continue
+        try:
+            keyword_hits = mail_list.evaluate_all(
+                "(els, kws) => els.map((e, i) => [i, e.textContent || ''])"
+                ".filter(([i, t]) => kws.some(k => t.toLowerCase().includes(k)))",
+                keywords,
+            ) if mail_list else []
+        except:
+            keyword_hits = []
+        for idx, mail_text in keyword_hits:
+            # 尝试从文本中提取 ID（支持 "ID: 310" 或跨行格式）
+            # 使用多行模式匹配，因为 ID 可能在单独一行
+            id_match = re.search(r'ID:\s*(\d+)', mail_text, re.MULTILINE)
+            mail_id = int(id_match.group(1)) if id_match else -1
+            if mail_id > 0:  # 只添加成功提取到 ID 的邮件
+                candidates.append((mail_id, mail_list.nth(idx), mail_text))
 
         # 按 ID 从大到小排序，优先使用最新的一封（ID 最大）
         if candidates:
@@ -601,9 +999,11 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                 # print(f"[临时邮箱] ⚠ 当前最高ID ({mail_id}) 未超过之前记录 ({last_max_id})，继续等待新邮件...")
                 pass
                 # 继续下一轮循环，等待真正的新邮件
+                idle_list_fingerprint = list_fingerprint
                 continue
         else:
             # 如果没有找到包含关键词的邮件，继续下一轮循环
+            idle_list_fingerprint = list_fingerprint
             continue
 
         # 只处理 ID 最大的那一封邮件
@@ -646,13 +1046,12 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                     except:
                         # 如果找不到返回按钮，重新加载收件箱页面
                         if tempmail_url:
-                            page.goto(tempmail_url, wait_until="networkidle", timeout=30000)
+                            open_tempmail_page(page, tempmail_url)
                         else:
                             # 如果没有提供 tempmail_url，尝试使用第一个邮箱 URL
                             if not TEMPMAIL_URLS:
                                 raise ValueError("未配置临时邮箱 URL，请在账号配置中添加 tempmail_url")
-                            page.goto(TEMPMAIL_URLS[0], wait_until="networkidle", timeout=30000)
-                        page.wait_for_timeout(3000)
+                            open_tempmail_page(page, TEMPMAIL_URLS[0])
                         # 切换到收件箱标签
                         try:
                             mailbox_tab = page.locator("div[data-name='mailbox'], //div[contains(@class, 'n-tabs-tab')][contains(., '收件箱')]").first
@@ -691,10 +1090,7 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                 # 注意：不直接使用 "button.n-button--info-type.n-button--small-type"，因为可能匹配到其他按钮
                 for p_selector in plain_text_btn_selectors:
                     try:
-                        if p_selector.startswith("//"):
-                            p_btn = page.locator(p_selector).first
-                        else:
-                            p_btn = page.locator(p_selector).first
+                        p_btn = page.locator(f"{p_selector} >> visible=true").first
                         if p_btn.is_visible():
                             # 再次确认按钮文本，避免误点击
                             btn_text = p_btn.text_content() or ""
@@ -713,13 +1109,12 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                                         # print("[临时邮箱] ⚠ 点击后误跳转到发送邮件页面，返回...")
                                         # 返回收件箱并继续下一轮循环
                                         if tempmail_url:
-                                            page.goto(tempmail_url, wait_until="networkidle", timeout=30000)
+                                            open_tempmail_page(page, tempmail_url)
                                         else:
                                             # 如果没有提供 tempmail_url，尝试使用第一个邮箱 URL
                                             if not TEMPMAIL_URLS:
                                                 raise ValueError("未配置临时邮箱 URL，请在账号配置中添加 tempmail_url")
-                                            page.goto(TEMPMAIL_URLS[0], wait_until="networkidle", timeout=30000)
-                                        page.wait_for_timeout(2000)
+                                            open_tempmail_page(page, TEMPMAIL_URLS[0])
                                         try:
                                             mailbox_tab = page.locator("div[data-name='mailbox']").first
                                             if mailbox_tab.is_visible():
@@ -763,16 +1158,12 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                 
                 for selector in content_selectors:
                     try:
-                        elements = page.locator(selector).all()
-                        for elem in elements:
-                            try:
-                                text = elem.text_content() or ""
-                                # 只选择包含验证码相关关键词的内容区域
-                                if any(kw in text.lower() for kw in ['验证码', 'verification', 'code', '一次性']):
-                                    if len(text) > len(mail_content):
-                                        mail_content = text
-                            except:
-                                continue
+                        # 一次取回所有匹配元素的文本，不再逐个调用 text_content()
+                        for text in page.locator(selector).all_text_contents():
+                            # 只选择包含验证码相关关键词的内容区域
+                            if any(kw in text.lower() for kw in ['验证码', 'verification', 'code', '一次性']):
+                                if len(text) > len(mail_content):
+                                    mail_content = text
                         if mail_content:
                             # 调试日志已关闭
                             # print(f"[临时邮箱] ✓ 从邮件内容区域提取到文本（长度: {len(mail_content)}）")
@@ -804,9 +1195,10 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                     # 调试日志已关闭
                     # print("[临时邮箱] ⚠ 使用整个页面文本（可能包含UI噪音）")
                 
-                # 记录浏览器方式获取的内容用于对比（仅第一次，当 API 方式失败后）
-                if not hasattr(get_verification_code_from_tempmail_browser, '_content_comparison_logged'):
-                    print(f"[临时邮箱] 邮件内容对比 - 浏览器方式获取的邮件内容（前500字符）:\n{mail_content[:500]}")
+                # 记录浏览器方式获取的内容用于对比（仅第一次，当 API 方式失败后；只在 LOGIN_DEBUG=1 时输出）
+                if (logger.isEnabledFor(logging.DEBUG)
+                        and not hasattr(get_verification_code_from_tempmail_browser, '_content_comparison_logged')):
+                    logger.debug("[临时邮箱] 邮件内容对比 - 浏览器方式获取的邮件内容（前500字符）:\n%s", mail_content[:500])
                     get_verification_code_from_tempmail_browser._content_comparison_logged = True
                 
                 code = extract_verification_code(mail_content)
@@ -816,6 +1208,9 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                     # 只有在成功提取验证码后，才更新 last_max_id，避免重复处理
                     if mail_id > last_max_id:
                         last_max_id = mail_id
+                    if tempmail_url:
+                        with _tempmail_state_lock:
+                            _last_code_mail[tempmail_url] = ("browser", mail_id)
                     return code
                 else:
                     # 调试日志已关闭
@@ -829,16 +1224,11 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
                     # 如果提取失败，不更新 last_max_id，允许下次重试同一封邮件
                     # 继续下一轮循环（等待刷新后重试）
             except Exception as e:
-                # 调试日志已关闭
-            # print(f"[临时邮箱] ⚠ 提取邮件内容时出错: {e}")
-                import traceback
-                traceback.print_exc()
+                # 轮询中每轮都可能出错，完整堆栈只在 LOGIN_DEBUG=1 时输出
+                logger.debug("[临时邮箱] ⚠ 提取邮件内容时出错: %s", e, exc_info=True)
                 # 如果出错，继续下一轮循环
         except Exception as e:
-            # 调试日志已关闭
-            # print(f"[临时邮箱] ⚠ 打开邮件时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.debug("[临时邮箱] ⚠ 打开邮件时出错: %s", e, exc_info=True)
             # 如果出错，继续下一轮循环
     
     # 调试日志已关闭（保留关键错误信息）
@@ -846,7 +1236,7 @@ def get_verification_code_from_tempmail_browser(page, timeout=120, tempmail_url:
     return None
 
 def wait_for_recaptcha_ready(page, timeout: int = 10) -> bool:
-    """等待 reCAPTCHA 准备好（检查 iframe 是否存在）
+    """等待 reCAPTCHA 准备好（检查 iframe 或容器是否存在）
     
     Args:
         page: Playwright 页面对象
@@ -856,31 +1246,16 @@ def wait_for_recaptcha_ready(page, timeout: int = 10) -> bool:
         bool: reCAPTCHA 是否已准备好
     """
     try:
-        waited = 0
-        check_interval = 1  # 每秒检查一次
-        
-        while waited < timeout:
-            # 检查是否有 reCAPTCHA iframe
-            recaptcha_iframe = page.locator("iframe[src*='recaptcha'], iframe[title*='reCAPTCHA']")
-            if recaptcha_iframe.count() > 0:
-                print("[登录] ✓ 检测到 reCAPTCHA iframe，reCAPTCHA 已准备好")
-                return True
-            
-            # 检查是否有 reCAPTCHA 容器
-            recaptcha_container = page.locator("#recaptcha-container")
-            if recaptcha_container.count() > 0:
-                print("[登录] ✓ 检测到 reCAPTCHA 容器，reCAPTCHA 已准备好")
-                return True
-            
-            page.wait_for_timeout(check_interval * 1000)
-            waited += check_interval
-        
-        return False
-    except:
+        page.locator(RECAPTCHA_FRAME_SELECTOR).first.wait_for(state="attached", timeout=timeout * 1000)
+        print("[登录] ✓ 检测到 reCAPTCHA，reCAPTCHA 已准备好")
+        return True
+    except Exception:
         return False
 
 def wait_for_recaptcha_complete(page, timeout: int = 30) -> bool:
-    """等待 reCAPTCHA 验证完成（检查 g-recaptcha-response 是否有值）
+    """等待 reCAPTCHA 验证完成（g-recaptcha-response 有值）
+    
+    在页面内按帧判断令牌是否已写入，令牌出现即返回。
     
     Args:
         page: Playwright 页面对象
@@ -890,70 +1265,74 @@ def wait_for_recaptcha_complete(page, timeout: int = 30) -> bool:
         bool: reCAPTCHA 是否已完成验证
     """
     try:
-        waited = 0
-        check_interval = 1  # 每秒检查一次
-        
-        while waited < timeout:
-            # 检查 g-recaptcha-response 是否有值
-            recaptcha_response = page.locator("#g-recaptcha-response")
-            if recaptcha_response.count() > 0:
-                try:
-                    response_value = recaptcha_response.input_value()
-                    if response_value and len(response_value) > 0:
-                        print(f"[登录] ✓ reCAPTCHA 验证完成（响应长度: {len(response_value)}）")
-                        return True
-                except:
-                    pass
-            
-            # 检查是否有可见的 reCAPTCHA 挑战框（如果出现，说明需要用户交互）
-            try:
-                # 检查是否有可见的 reCAPTCHA 挑战框（通常是一个较大的 iframe）
-                visible_challenge = page.locator("iframe[src*='recaptcha'][src*='bframe']")
-                if visible_challenge.count() > 0:
-                    # 检查 iframe 是否可见（宽度和高度大于某个阈值）
-                    for i in range(visible_challenge.count()):
-                        try:
-                            box = visible_challenge.nth(i).bounding_box()
-                            if box and box['width'] > 100 and box['height'] > 100:
-                                print("[登录] ⚠ 检测到可见的 reCAPTCHA 挑战框，等待用户完成挑战...")
-                                # 等待挑战框消失（用户完成挑战）
-                                challenge_wait = 0
-                                while challenge_wait < 60:  # 最多等待60秒
-                                    try:
-                                        box_check = visible_challenge.nth(i).bounding_box()
-                                        if not box_check or box_check['width'] < 100 or box_check['height'] < 100:
-                                            print("[登录] ✓ reCAPTCHA 挑战框已消失，验证可能已完成")
-                                            break
-                                    except:
-                                        break
-                                    page.wait_for_timeout(2000)
-                                    challenge_wait += 2
-                                
-                                # 再次检查响应值
-                                try:
-                                    response_value = recaptcha_response.input_value()
-                                    if response_value and len(response_value) > 0:
-                                        print(f"[登录] ✓ reCAPTCHA 验证完成（挑战后响应长度: {len(response_value)}）")
-                                        return True
-                                except:
-                                    pass
-                        except:
-                            continue
-            except:
-                pass
-            
-            page.wait_for_timeout(check_interval * 1000)
-            waited += check_interval
-            
-            # 每5秒输出一次等待状态
-            if waited % 5 == 0:
-                print(f"[登录] 等待 reCAPTCHA 验证完成... (已等待 {waited} 秒)")
-        
-        print(f"[登录] ⚠ 等待 reCAPTCHA 验证完成超时（{timeout} 秒），继续执行...")
-        return False
-    except Exception as e:
-        print(f"[登录] ⚠ 检查 reCAPTCHA 状态时出错: {e}")
-        return False
+        page.wait_for_function(RECAPTCHA_TOKEN_JS, timeout=timeout * 1000)
+        print("[登录] ✓ reCAPTCHA 验证完成")
+        return True
+    except Exception:
+        pass
+    
+    # 超时后检查是否出现了可见的挑战框（需要用户交互），出现时再给 60 秒完成挑战
+    try:
+        challenge = page.locator("iframe[src*='recaptcha'][src*='bframe']").first
+        box = challenge.bounding_box() if challenge.count() else None
+        if box and box['width'] > 100 and box['height'] > 100:
+            print("[登录] ⚠ 检测到可见的 reCAPTCHA 挑战框，等待用户完成挑战...")
+            page.wait_for_function(RECAPTCHA_TOKEN_JS, timeout=60000)
+            print("[登录] ✓ reCAPTCHA 验证完成（挑战后）")
+            return True
+    except Exception:
+        pass
+    
+    print(f"[登录] ⚠ 等待 reCAPTCHA 验证完成超时（{timeout} 秒），继续执行...")
+    return False
+
+def random_click_position(locator) -> Optional[dict]:
+    """点击位置：元素中心附近 ±5px 随机偏移（相对元素左上角，且不超出元素范围），由 click(position=...) 在同一次操作中完成移动和点击
+    
+    取不到元素位置时返回 None，click 使用默认的中心点。
+    """
+    box = locator.bounding_box()
+    if not box:
+        return None
+    width, height = box["width"], box["height"]
+    return {
+        "x": min(max(width / 2 + random.uniform(-5, 5), 0), width),
+        "y": min(max(height / 2 + random.uniform(-5, 5), 0), height),
+    }
+
+def check_toast_after_resend(page, timeout: int = 5, idle_message: str = "页面状态正常") -> tuple[bool, bool]:
+    """点击"重新发送验证码"后检查页面提示框（成功 / 错误提示），提示出现即返回
+    
+    Args:
+        page: Playwright 页面对象
+        timeout: 最长等待时间（秒）
+        idle_message: 既没有成功提示也没有错误提示时的日志说明
+    
+    Returns:
+        (success_detected, error_detected): 是否出现成功提示 / 错误提示
+    """
+    # 在页面内每 100ms 检查一次（不经过 Python 往返，也不必按帧检查），提示出现后直接返回其内容
+    try:
+        toast = page.wait_for_function(TOAST_STATE_JS, polling=100, timeout=timeout * 1000).json_value() or {}
+    except Exception:
+        toast = {}
+    success_text_found = toast.get("sent", "")
+    error_text_found = toast.get("error", "")
+    
+    if error_text_found:
+        print(f"[登录] ⚠ 检测到错误提示元素: {error_text_found}")
+    if success_text_found:
+        print(f"[登录] ✓ 检测到成功提示元素: {success_text_found}")
+    
+    if error_text_found:
+        print(f"[登录] ⚠ 检测到页面错误提示，可能的原因：页面显示错误提示，导致验证码邮件未发送成功")
+        if success_text_found:
+            print(f"[登录] ⚠ 同时也检测到成功提示，页面状态可能不稳定")
+    elif success_text_found:
+        print(f"[登录] ✓ 检测到成功提示，验证码邮件应该已发送成功")
+    else:
+        print(f"[登录] ℹ 未检测到明显的错误或成功提示元素，{idle_message}")
+    return bool(success_text_found), bool(error_text_found)
 
 def login_with_email_and_code(page, email: str, code: str) -> bool:
     """使用邮箱和验证码登录"""
@@ -972,24 +1351,8 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
     # 优先直接查找验证码输入框（避免再次触发"发送验证码"）
     # 调试日志已关闭
     # print("[登录] 尝试直接查找验证码输入框...")
-    code_input_selectors = [
-        "input[name='pinInput']",
-        "input[type='text'][placeholder*='code' i]",
-        "input[placeholder*='验证码' i]",
-        "input[name='code']",
-        "input[autocomplete='one-time-code']",
-    ]
-    
-    code_input = None
-    for selector in code_input_selectors:
-        try:
-            code_input = page.locator(selector).first
-            if code_input.is_visible():
-                # 调试日志已关闭
-                # print("[登录] ✓ 在当前页面找到了验证码输入框")
-                break
-        except:
-            continue
+    # 所有候选选择器合并为一次查询，只取可见的第一个
+    code_input = page.locator(f"{CODE_INPUT_SELECTOR} >> visible=true").first
     
     # 如未能直接找到验证码输入框，说明可能还停留在“邮箱输入”页面
     # 为了兼容性，这里才尝试再提交一次邮箱
@@ -997,22 +1360,9 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
         # 调试日志已关闭
         # print("[登录] ⚠ 当前未找到验证码输入框，可能仍在邮箱输入页面，尝试再次提交邮箱...")
 
-        email_input_selectors = [
-            "#email-input",
-            "input[aria-label='邮箱']",
-            "input[type='text'][name='loginHint']",
-        ]
-
-        email_input = None
-        for selector in email_input_selectors:
-            try:
-                email_input = page.locator(selector).first
-                if email_input.is_visible():
-                    break
-            except:
-                continue
+        email_input = page.locator(f"{EMAIL_INPUT_SELECTOR} >> visible=true").first
 
-        if not email_input or not email_input.is_visible():
+        if not email_input.is_visible():
             print("[登录] ✗ 未找到邮箱输入框，也未找到验证码输入框，无法继续登录流程")
             return False
 
@@ -1042,41 +1392,31 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
         # 再次尝试查找验证码输入框
         # 调试日志已关闭
         # print("[登录] 再次查找验证码输入框...")
-        code_input = None
-        for selector in code_input_selectors:
-            try:
-                code_input = page.locator(selector).first
-                if code_input.is_visible():
-                    # 调试日志已关闭
-                    # print("[登录] ✓ 已找到验证码输入框")
-                    break
-            except:
-                continue
+        code_input = page.locator(f"{CODE_INPUT_SELECTOR} >> visible=true").first
 
         # 仍然没找到时，最后兜底：选择第一个可见的 text 输入框（排除邮箱输入框）
         if (not code_input) or (not code_input.is_visible()):
             try:
                 # 调试日志已关闭
                 # print("[登录] ⚠ 未通过特定选择器找到验证码输入框，尝试兜底策略...")
-                text_inputs = page.locator("input[type='text']").all()
-                for inp in text_inputs:
-                    try:
-                        elem_id = (inp.get_attribute("id") or "").lower()
-                        name_attr = (inp.get_attribute("name") or "").lower()
-                        aria_label = (inp.get_attribute("aria-label") or "").lower()
-                        if "email" in name_attr or "loginhint" in name_attr:
-                            continue
-                        if elem_id == "email-input":
-                            continue
-                        if "邮箱" in aria_label:
-                            continue
-                        if inp.is_visible():
-                            code_input = inp
-                            # 调试日志已关闭
-                            # print("[登录] ✓ 通过兜底策略选中了一个可能的验证码输入框")
-                            break
-                    except:
+                # 所有文本输入框的属性和可见性在页面内一次取回，再在 Python 端筛选
+                text_inputs = page.locator("input[type='text']")
+                input_attrs = text_inputs.evaluate_all(
+                    "els => els.map(e => [e.id || '', e.name || '', e.getAttribute('aria-label') || '', e.getClientRects().length > 0])"
+                )
+                for idx, (elem_id, name_attr, aria_label, visible) in enumerate(input_attrs):
+                    name_attr = name_attr.lower()
+                    if "email" in name_attr or "loginhint" in name_attr:
+                        continue
+                    if elem_id.lower() == "email-input":
                         continue
+                    if "邮箱" in aria_label:
+                        continue
+                    if visible:
+                        code_input = text_inputs.nth(idx)
+                        # 调试日志已关闭
+                        # print("[登录] ✓ 通过兜底策略选中了一个可能的验证码输入框")
+                        break
             except Exception as e:
                 # 调试日志已关闭
                 # print(f"[登录] ⚠ 兜底查找验证码输入框时出错: {e}")
@@ -1111,7 +1451,7 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
         """检查验证码错误提示（仅在验证码页面执行）"""
         # 先检查是否在验证码页面
         current_url_check = page.url
-        if "accountverification" not in current_url_check or "verify-oob-code" not in current_url_check:
+        if not is_verify_page_url(current_url_check):
             return None  # 不在验证码页面，不检查
         
         try:
@@ -1189,7 +1529,7 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
                         page.wait_for_timeout(3000)
                         return True
                     # 如果跳转回 accountverification 页面，说明验证码错误，需要重新输入
-                    if "accountverification" in current_url_auth and "verify-oob-code" in current_url_auth:
+                    if is_verify_page_url(current_url_auth):
                         print("[登录] ✗ 已跳转回验证码输入页面，验证码可能无效，需要重新获取验证码")
                         return "CODE_ERROR"
                     # 如果已经不在 auth 页面，跳出这个循环，继续主循环
@@ -1206,7 +1546,7 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
             
             # 在等待跳转时，如果仍在验证码页面，检查是否有验证码错误提示
             # 注意：错误提示只会在验证码页面显示，所以只在验证码页面检查
-            if "accountverification" in current_url and "verify-oob-code" in current_url:
+            if is_verify_page_url(current_url):
                 error_result = check_verification_code_errors()
                 if error_result:
                     return error_result
@@ -1234,6 +1574,7 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
             max_wait_redirect = 40
             waited_redirect = 0
             redirect_occurred = False
+            redirect_delays = backoff_delays()
             
             while waited_redirect < max_wait_redirect:
                 current_url_check = page.url
@@ -1248,9 +1589,10 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
                     redirect_occurred = True
                     return True
                 
-                # 每 2 秒检查一次
-                page.wait_for_timeout(2000)
-                waited_redirect += 2
+                # 检查间隔逐步拉长（250ms 起，最长 5 秒）
+                delay = next(redirect_delays)
+                page.wait_for_timeout(delay)
+                waited_redirect += delay / 1000
             
             # 如果等待超时，检查页面状态
             if not redirect_occurred:
@@ -1322,7 +1664,7 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
             pass
         
             # 如果仍在验证码页面，先检查是否有错误提示（验证码错误、超时等）
-        if "accountverification" in current_url and "verify-oob-code" in current_url:
+        if is_verify_page_url(current_url):
             print(f"[登录] 检测到仍在验证码页面，检查是否有错误提示... (当前 URL: {current_url})")
             try:
                 page_text = page.locator("body").text_content() or ""
@@ -1356,15 +1698,15 @@ def login_with_email_and_code(page, email: str, code: str) -> bool:
         print("[登录] ✗ 登录失败或仍在登录页面")
         return False
 
-def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
+def extract_cookies_and_csesidx(page) -> Optional[SessionData]:
     """提取 Cookie 和 csesidx"""
-    print("[提取] 正在提取 Cookie 和 csesidx...")
+    logger.debug("[提取] 正在提取 Cookie 和 csesidx...")
     
     # 检查当前 URL，如果在 accountverification 页面，需要等待跳转或导航
     current_url_check = page.url
-    print(f"[提取] 当前 URL: {current_url_check}")
+    logger.debug("[提取] 当前 URL: %s", current_url_check)
     if "accountverification" in current_url_check:
-        print("[提取] 检测到 accountverification 页面，等待跳转到主域名...")
+        logger.debug("[提取] 检测到 accountverification 页面，等待跳转到主域名...")
         # 在无头模式下，JavaScript 重定向可能不会自动触发，需要更主动地处理
         max_wait_redirect = 20  # 等待最多 20 秒
         waited_redirect = 0
@@ -1374,7 +1716,7 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
             current_url_check_loop = page.url
             if ("business.gemini.google" in current_url_check_loop 
                 and "accountverification" not in current_url_check_loop):
-                print("[提取] ✓ 已跳转到主域名")
+                logger.info("[提取] ✓ 已跳转到主域名")
                 redirect_occurred = True
                 break
             page.wait_for_timeout(2000)
@@ -1391,7 +1733,7 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
         
         # 如果等待超时，直接导航到主域名
         if not redirect_occurred:
-            print("[提取] 等待跳转超时，直接导航到主域名...")
+            logger.debug("[提取] 等待跳转超时，直接导航到主域名...")
             try:
                 # 先尝试通过 JavaScript 导航
                 try:
@@ -1402,20 +1744,20 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
                     # 如果 JavaScript 导航失败，使用 goto
                     page.goto("https://business.gemini.google/", wait_until="networkidle", timeout=30000)
                     page.wait_for_timeout(3000)
-                print("[提取] ✓ 已导航到 business.gemini.google 主域名")
+                logger.info("[提取] ✓ 已导航到 business.gemini.google 主域名")
             except Exception as e:
-                print(f"[提取] ⚠ 导航失败: {e}，继续尝试提取 Cookie...")
+                logger.warning("[提取] ⚠ 导航失败: %s，继续尝试提取 Cookie...", e)
     
     # 等待页面完全加载和 Cookie 设置
-    print("[提取] 等待页面加载和 Cookie 设置...")
+    logger.debug("[提取] 等待页面加载和 Cookie 设置...")
     page.wait_for_timeout(5000)  # 等待 5 秒
     
     # 确保导航到正确的页面
     current_url = page.url
-    print(f"[提取] 检查页面状态，当前 URL: {current_url}")
+    logger.debug("[提取] 检查页面状态，当前 URL: %s", current_url)
     if "login" in current_url or "auth" in current_url or "accountverification" in current_url:
         if "accountverification" in current_url:
-            print("[提取] 当前在 accountverification 页面，等待跳转到主域名...")
+            logger.debug("[提取] 当前在 accountverification 页面，等待跳转到主域名...")
         elif "auth.business.gemini.google" in current_url:
             # 不立即打印警告，先等待看是否会跳转到主域名（这是正常流程）
             # 等待跳转（最多等待 10 秒）
@@ -1425,24 +1767,24 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
                 current_url_auth = page.url
                 # 如果跳转回 accountverification 页面，说明需要重新输入验证码
                 if "accountverification" in current_url_auth:
-                    print("[提取] ✗ 已跳转回验证码输入页面，验证码可能无效，需要重新获取验证码")
+                    logger.warning("[提取] ✗ 已跳转回验证码输入页面，验证码可能无效，需要重新获取验证码")
                     return None  # 返回 None，让调用者重新获取验证码
                 # 如果跳转到主域名，说明登录成功（这是正常流程）
                 if ("business.gemini.google" in current_url_auth 
                     and "accountverification" not in current_url_auth
                     and "login" not in current_url_auth 
                     and "auth" not in current_url_auth):
-                    print("[提取] ✓ 已跳转到主域名")
+                    logger.info("[提取] ✓ 已跳转到主域名")
                     break
                 page.wait_for_timeout(1000)
                 waited_auth += 1
             
             # 如果等待超时仍在 auth 页面，才认为验证码可能无效
             if "auth.business.gemini.google" in page.url:
-                print("[提取] ✗ 仍在 auth 页面，验证码可能无效")
+                logger.warning("[提取] ✗ 仍在 auth 页面，验证码可能无效")
                 return None
         else:
-            print("[提取] 当前仍在登录页面，等待跳转...")
+            logger.debug("[提取] 当前仍在登录页面，等待跳转...")
         
         try:
             # 等待页面跳转到 business.gemini.google 主域名（排除 accountverification 等子域名）
@@ -1450,20 +1792,20 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
                 "() => window.location.href.includes('business.gemini.google') && !window.location.href.includes('accountverification') && !window.location.href.includes('login') && !window.location.href.includes('auth')",
                 timeout=30000
             )
-            print("[提取] ✓ 页面已跳转到 business.gemini.google 主域名")
+            logger.info("[提取] ✓ 页面已跳转到 business.gemini.google 主域名")
         except:
             # 如果等待超时，检查是否仍在 auth 页面
             if "auth.business.gemini.google" in page.url:
-                print("[提取] ✗ 仍在 auth 页面，验证码可能无效")
+                logger.warning("[提取] ✗ 仍在 auth 页面，验证码可能无效")
                 return None
             # 如果等待超时，尝试直接导航
-            print("[提取] 等待跳转超时，尝试直接导航到主域名...")
+            logger.debug("[提取] 等待跳转超时，尝试直接导航到主域名...")
             try:
                 page.goto("https://business.gemini.google/", wait_until="networkidle", timeout=30000)
                 page.wait_for_timeout(3000)
-                print("[提取] ✓ 已导航到 business.gemini.google 主域名")
+                logger.info("[提取] ✓ 已导航到 business.gemini.google 主域名")
             except:
-                print("[提取] ⚠ 导航失败，继续尝试提取 Cookie...")
+                logger.warning("[提取] ⚠ 导航失败，继续尝试提取 Cookie...")
     
     # 再次等待，确保 Cookie 已设置
     page.wait_for_timeout(3000)
@@ -1474,11 +1816,11 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
     
     for retry in range(3):
         cookies = page.context.cookies()
-        print(f"[提取] 获取到 {len(cookies)} 个 Cookie (重试 {retry + 1}/3)")
+        logger.debug("[提取] 获取到 %s 个 Cookie (重试 %s/3)", len(cookies), retry + 1)
         
         # 打印所有 Cookie 名称用于调试
         cookie_names = [c.get('name', '') for c in cookies]
-        print(f"[提取] Cookie 列表: {', '.join(cookie_names[:10])}{'...' if len(cookie_names) > 10 else ''}")
+        logger.debug("[提取] Cookie 列表: %s%s", ', '.join(cookie_names[:10]), '...' if len(cookie_names) > 10 else '')
         
         for cookie in cookies:
             if cookie['name'] == '__Secure-C_SES':
@@ -1490,10 +1832,10 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
             break
         
         if retry < 2:
-            print(f"[提取] 未找到 __Secure-C_SES Cookie，等待后重试 ({retry + 1}/3)...")
+            logger.debug("[提取] 未找到 __Secure-C_SES Cookie，等待后重试 (%s/3)...", retry + 1)
             # 尝试重新加载页面以触发 Cookie 设置
             if retry == 1:
-                print("[提取] 尝试重新加载页面...")
+                logger.debug("[提取] 尝试重新加载页面...")
                 try:
                     page.reload(wait_until="networkidle", timeout=30000)
                     page.wait_for_timeout(3000)
@@ -1504,23 +1846,18 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
     
     # 如果还是没找到，尝试从 document.cookie 获取
     if not secure_c_ses:
-        print("[提取] 尝试从 document.cookie 获取...")
+        logger.debug("[提取] 尝试从 document.cookie 获取...")
         try:
-            page_cookies = page.evaluate("document.cookie")
-            if page_cookies:
-                # 解析 Cookie 字符串
-                for cookie_pair in page_cookies.split(';'):
-                    cookie_pair = cookie_pair.strip()
-                    if cookie_pair.startswith('__Secure-C_SES='):
-                        secure_c_ses = cookie_pair.split('=', 1)[1]
-                    elif cookie_pair.startswith('__Host-C_OSES='):
-                        host_c_oses = cookie_pair.split('=', 1)[1]
+            # 在页面内解析 Cookie 字符串，只回传需要的两个字段
+            page_cookies = page.evaluate(DOC_COOKIE_JS) or {}
+            secure_c_ses = page_cookies.get('__Secure-C_SES') or secure_c_ses
+            host_c_oses = page_cookies.get('__Host-C_OSES') or host_c_oses
         except Exception as e:
-            print(f"[提取] 从 document.cookie 获取失败: {e}")
+            logger.warning("[提取] 从 document.cookie 获取失败: %s", e)
         
         # 如果仍然没找到，尝试访问 API 端点以触发 Cookie 设置
         if not secure_c_ses:
-            print("[提取] 尝试访问 API 端点以触发 Cookie 设置...")
+            logger.debug("[提取] 尝试访问 API 端点以触发 Cookie 设置...")
             try:
                 # 访问一个需要认证的页面
                 page.goto("https://business.gemini.google/", wait_until="networkidle", timeout=30000)
@@ -1534,7 +1871,7 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
                     elif cookie['name'] == '__Host-C_OSES':
                         host_c_oses = cookie['value']
             except Exception as e:
-                print(f"[提取] 访问 API 端点失败: {e}")
+                logger.warning("[提取] 访问 API 端点失败: %s", e)
     
     # 获取 csesidx 和 team_id
     current_url = page.url
@@ -1545,7 +1882,7 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
     match = re.search(r'csesidx[=:](\d+)', current_url)
     if match:
         csesidx = match.group(1)
-        print(f"[提取] ✓ 从URL提取到 csesidx: {csesidx}")
+        logger.info("[提取] ✓ 从URL提取到 csesidx: %s", csesidx)
     else:
         # 从页面中提取
         try:
@@ -1553,7 +1890,7 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
             match = re.search(r'csesidx[=:](\d+)', page_text)
             if match:
                 csesidx = match.group(1)
-                print(f"[提取] ✓ 从页面提取到 csesidx: {csesidx}")
+                logger.info("[提取] ✓ 从页面提取到 csesidx: %s", csesidx)
         except:
             pass
     
@@ -1583,43 +1920,41 @@ def extract_cookies_and_csesidx(page) -> Optional[Dict[str, str]]:
             pass
     
     if secure_c_ses:
-        print(f"[提取] ✓ 提取到 __Secure-C_SES: {secure_c_ses[:50]}...")
+        logger.info("[提取] ✓ 提取到 __Secure-C_SES: %s...", secure_c_ses[:50])
     else:
         # 保留关键错误信息
-        print("[提取] ✗ 未提取到 __Secure-C_SES")
+        logger.warning("[提取] ✗ 未提取到 __Secure-C_SES")
     
     if host_c_oses:
-        print(f"[提取] ✓ 提取到 __Host-C_OSES: {host_c_oses[:50]}...")
+        logger.info("[提取] ✓ 提取到 __Host-C_OSES: %s...", host_c_oses[:50])
     else:
-        print("[提取] ⚠ 未提取到 __Host-C_OSES（可能正常）")
+        logger.warning("[提取] ⚠ 未提取到 __Host-C_OSES（可能正常）")
     
     if team_id:
-        print(f"[提取] ✓ 提取到 team_id: {team_id}")
+        logger.info("[提取] ✓ 提取到 team_id: %s", team_id)
     else:
-        print("[提取] ⚠ 未提取到 team_id（可能正常，某些账号可能没有）")
+        logger.warning("[提取] ⚠ 未提取到 team_id（可能正常，某些账号可能没有）")
     
     if secure_c_ses and csesidx:
-        result = {
-            "secure_c_ses": secure_c_ses,
-            "host_c_oses": host_c_oses or "",
-            "csesidx": csesidx
-        }
-        if team_id:
-            result["team_id"] = team_id
-        return result
+        return SessionData(
+            secure_c_ses=secure_c_ses,
+            host_c_oses=host_c_oses or "",
+            csesidx=csesidx,
+            team_id=team_id or None,
+        )
     else:
         return None
 
-def test_cookie_with_jwt(account: Dict[str, str]) -> bool:
+def test_cookie_with_jwt(session: SessionData) -> bool:
     """通过 JWT 测试 Cookie 是否有效"""
     import requests
     
-    secure_c_ses = account.get("secure_c_ses")
-    host_c_oses = account.get("host_c_oses", "")
-    csesidx = account.get("csesidx")
+    secure_c_ses = session.secure_c_ses
+    host_c_oses = session.host_c_oses
+    csesidx = session.csesidx
     
     if not secure_c_ses or not csesidx:
-        print("[验证] ✗ 缺少 secure_c_ses 或 csesidx")
+        logger.warning("[验证] ✗ 缺少 secure_c_ses 或 csesidx")
         return False
     
     url = f"{GETOXSRF_URL}?csesidx={csesidx}"
@@ -1638,16 +1973,16 @@ def test_cookie_with_jwt(account: Dict[str, str]) -> bool:
             data = json.loads(text)
             key_id = data.get("keyId")
             if key_id:
-                print(f"[验证] ✓ JWT 验证成功 - key_id: {key_id[:50]}...")
+                logger.info("[验证] ✓ JWT 验证成功 - key_id: %s...", key_id[:50])
                 return True
             else:
-                print("[验证] ✗ JWT 验证失败 - 缺少 keyId")
+                logger.warning("[验证] ✗ JWT 验证失败 - 缺少 keyId")
                 return False
         else:
-            print(f"[验证] ✗ JWT 验证失败 - HTTP {resp.status_code}")
+            logger.warning("[验证] ✗ JWT 验证失败 - HTTP %s", resp.status_code)
             return False
     except Exception as e:
-        print(f"[验证] ✗ JWT 验证失败 - {e}")
+        logger.warning("[验证] ✗ JWT 验证失败 - %s", e)
         return False
 
 def main():
@@ -1711,92 +2046,7 @@ def main():
         )
         
         # 注入脚本以隐藏自动化特征（增强版，更好地绕过 reCAPTCHA）
-        context.add_init_script("""
-            // 覆盖 navigator.webdriver
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-            
-            // 覆盖 chrome 对象
-            window.chrome = {
-                runtime: {},
-                loadTimes: function() {},
-                csi: function() {},
-                app: {}
-            };
-            
-            // 覆盖 permissions
-            const originalQuery = window.navigator.permissions.query;
-            window.navigator.permissions.query = (parameters) => (
-                parameters.name === 'notifications' ?
-                    Promise.resolve({ state: Notification.permission }) :
-                    originalQuery(parameters)
-            );
-            
-            // 覆盖 plugins
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
-            
-            // 覆盖 languages
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['zh-CN', 'zh', 'en']
-            });
-            
-            // 覆盖 webdriver 相关属性
-            delete navigator.__proto__.webdriver;
-            
-            // 覆盖 getBattery
-            if (navigator.getBattery) {
-                navigator.getBattery = () => Promise.resolve({
-                    charging: true,
-                    chargingTime: 0,
-                    dischargingTime: Infinity,
-                    level: 1
-                });
-            }
-            
-            // 覆盖 connection
-            Object.defineProperty(navigator, 'connection', {
-                get: () => ({
-                    effectiveType: '4g',
-                    rtt: 50,
-                    downlink: 10,
-                    saveData: false
-                })
-            });
-            
-            // 覆盖 hardwareConcurrency
-            Object.defineProperty(navigator, 'hardwareConcurrency', {
-                get: () => 8
-            });
-            
-            // 覆盖 deviceMemory
-            Object.defineProperty(navigator, 'deviceMemory', {
-                get: () => 8
-            });
-            
-            // 覆盖 canvas 指纹
-            const originalToDataURL = HTMLCanvasElement.prototype.toDataURL;
-            HTMLCanvasElement.prototype.toDataURL = function(type) {
-                if (type === 'image/png') {
-                    return originalToDataURL.apply(this, arguments);
-                }
-                return originalToDataURL.apply(this, arguments);
-            };
-            
-            // 覆盖 WebGL 指纹
-            const getParameter = WebGLRenderingContext.prototype.getParameter;
-            WebGLRenderingContext.prototype.getParameter = function(parameter) {
-                if (parameter === 37445) {
-                    return 'Intel Inc.';
-                }
-                if (parameter === 37446) {
-                    return 'Intel Iris OpenGL Engine';
-                }
-                return getParameter.apply(this, arguments);
-            };
-        """)
+        context.add_init_script(script=FINGERPRINT_INIT_JS)
         
         # 创建两个标签页：一个用于临时邮箱，一个用于登录
         email_page = context.new_page()
@@ -1820,18 +2070,23 @@ def main():
             print("\n" + "="*60)
             print("步骤2: 在登录页面输入邮箱")
             print("="*60)
-            login_page.goto(GEMINI_LOGIN_URL, wait_until="networkidle", timeout=60000)
-            login_page.wait_for_timeout(3000)
+            login_page.goto(GEMINI_LOGIN_URL, wait_until="domcontentloaded", timeout=30000)
             
             # 填写邮箱（使用实际页面的 id / aria-label / name）
             try:
-                email_input = login_page.locator(
-                    "#email-input, input[aria-label='邮箱'], input[type='text'][name='loginHint']"
-                ).first
+                email_input = login_page.locator(EMAIL_INPUT_SELECTOR).first
+                try:
+                    email_input.wait_for(state="visible", timeout=15000)
+                except Exception:
+                    pass
                 if email_input.is_visible():
                     email_input.fill(email)
                     print(f"[登录] ✓ 已填写邮箱: {email}")
-                    login_page.wait_for_timeout(2000)
+                    # 等待"继续"按钮可用即可点击，最多 5 秒
+                    try:
+                        login_page.wait_for_function(CONTINUE_BTN_ENABLED_JS, timeout=5000)
+                    except Exception:
+                        pass
                     
                     # 点击继续
                     try:
@@ -1848,11 +2103,12 @@ def main():
                             
                             # 点击后等待 reCAPTCHA 验证完成
                             wait_for_recaptcha_complete(login_page, timeout=30)
-                            
-                            login_page.wait_for_timeout(2000)  # 额外等待2秒让页面响应
                     except:
                         email_input.press("Enter")
-                        login_page.wait_for_timeout(5000)
+                        try:
+                            login_page.wait_for_url(is_verify_page_url, timeout=15000)
+                        except Exception:
+                            pass
             except Exception as e:
                 print(f"[登录] ⚠ 填写邮箱时出错: {e}")
             
@@ -1860,6 +2116,8 @@ def main():
             max_retry = 3  # 最多重试3次
             retry_count = 0
             success = False
+            # 无法判断是否有新邮件时的重试间隔：指数递增，封顶 5 秒
+            retry_delays = backoff_delays(start_ms=500, max_ms=5000)
             
             while retry_count < max_retry and not success:
                 if retry_count > 0:
@@ -1890,8 +2148,9 @@ def main():
                 if result == "CODE_ERROR":
                     print("\n[重试] 验证码错误，将刷新邮件并重新获取最新验证码...")
                     retry_count += 1
-                    # 等待一下再继续，避免过快重试
-                    time.sleep(3)
+                    # 重试模式只读取一次邮箱，先等待（最多 3 秒）比被拒绝的验证码更新的邮件出现，避免立即重读同一个验证码
+                    if wait_for_newer_mail(email_page, tempmail_url) is None:
+                        time.sleep(next(retry_delays) / 1000)
                     continue
                 elif result is True:
                     success = True
@@ -1932,9 +2191,9 @@ def main():
             if is_valid:
                 print("\n✓ 登录成功，Cookie 有效！")
                 print("\n提取的 Cookie 信息：")
-                print(f"  secure_c_ses: {cookies_data['secure_c_ses'][:50]}...")
-                print(f"  host_c_oses: {cookies_data.get('host_c_oses', 'N/A')[:50] if cookies_data.get('host_c_oses') else 'N/A'}...")
-                print(f"  csesidx: {cookies_data['csesidx']}")
+                print(f"  secure_c_ses: {cookies_data.secure_c_ses[:50]}...")
+                print(f"  host_c_oses: {cookies_data.host_c_oses[:50] if cookies_data.host_c_oses else 'N/A'}...")
+                print(f"  csesidx: {cookies_data.csesidx}")
                 
                 # 保存到配置文件（可选）
                 save_input = input("\n是否保存到配置文件？(y/n): ").strip().lower()
@@ -1957,14 +2216,19 @@ def main():
                 # 在某些非交互环境下可能没有标准输入，直接跳过
                 pass
 
-def save_to_config(cookies_data: Dict[str, str], account_index: Optional[int] = None, tempmail_name: Optional[str] = None):
+def save_to_config(session: SessionData, account_index: Optional[int] = None, tempmail_name: Optional[str] = None):
     """保存 Cookie 到配置（支持数据库和 JSON）
     
     Args:
-        cookies_data: Cookie 数据
+        session: 提取到的会话数据
         account_index: 如果提供，更新指定索引的账号；否则创建新账号
         tempmail_name: 临时邮箱名称（用于显示）
     """
+    if tempmail_name:
+        session.tempmail_name = tempmail_name
+    # 只在写入配置时转换为 dict，未提取到的可选字段（team_id、tempmail_name）不写入
+    session_fields = {k: v for k, v in asdict(session).items() if v is not None}
+    
     try:
         # 尝试使用 account_manager（如果可用，会自动使用数据库）
         try:
@@ -1982,40 +2246,28 @@ def save_to_config(cookies_data: Dict[str, str], account_index: Optional[int] =
                 account_manager.load_config()
             
             account_data = {
-                "secure_c_ses": cookies_data["secure_c_ses"],
-                "host_c_oses": cookies_data.get("host_c_oses", ""),
-                "csesidx": cookies_data["csesidx"],
+                **session_fields,
                 "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
                 "available": True,
             }
             
-            # 如果提取到了 team_id，添加到账号中
-            if "team_id" in cookies_data and cookies_data["team_id"]:
-                account_data["team_id"] = cookies_data["team_id"]
-            
-            # 如果提供了邮箱名称，保存它
-            if tempmail_name:
-                account_data["tempmail_name"] = tempmail_name
-            
             # 更新现有账号或创建新账号
             if account_index is not None and 0 <= account_index < len(account_manager.accounts):
                 # 更新现有账号，只更新 Cookie 相关字段，保留其他所有字段
                 old_account = account_manager.accounts[account_index]
                 
                 # 只更新 Cookie 相关字段
-                old_account["secure_c_ses"] = account_data["secure_c_ses"]
-                old_account["host_c_oses"] = account_data["host_c_oses"]
-                old_account["csesidx"] = account_data["csesidx"]
+                old_account["secure_c_ses"] = session.secure_c_ses
+                old_account["host_c_oses"] = session.host_c_oses
+                old_account["csesidx"] = session.csesidx
                 
                 # 如果新数据有 team_id，更新它；否则保留原有的（包括空字符串）
-                if "team_id" in cookies_data and cookies_data["team_id"]:
-                    old_account["team_id"] = cookies_data["team_id"]
-                # 如果新数据没有 team_id，保留原有的（不覆盖）
+                if session.team_id:
+                    old_account["team_id"] = session.team_id
                 
-                # 如果提供了邮箱名称，更新它
-                if tempmail_name:
-                    old_account["tempmail_name"] = tempmail_name
-                # 如果新数据没有 tempmail_name，保留原有的（不覆盖）
+                # 如果有邮箱名称，更新它；否则保留原有的（不覆盖）
+                if session.tempmail_name:
+                    old_account["tempmail_name"] = session.tempmail_name
                 
                 # 保留 tempmail_url（如果存在）
                 # 不更新 user_agent，保留原有的
@@ -2060,9 +2312,7 @@ def save_to_config(cookies_data: Dict[str, str], account_index: Optional[int] =
             config["accounts"] = []
         
         account_data = {
-            "secure_c_ses": cookies_data["secure_c_ses"],
-            "host_c_oses": cookies_data.get("host_c_oses", ""),
-            "csesidx": cookies_data["csesidx"],
+            **session_fields,
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
             "available": True,
             "quota_usage": {
@@ -2075,14 +2325,6 @@ def save_to_config(cookies_data: Dict[str, str], account_index: Optional[int] =
             "quota_reset_date": None,
         }
         
-        # 如果提取到了 team_id，添加到账号中
-        if "team_id" in cookies_data and cookies_data["team_id"]:
-            account_data["team_id"] = cookies_data["team_id"]
-        
-        # 如果提供了邮箱名称，保存它
-        if tempmail_name:
-            account_data["tempmail_name"] = tempmail_name
-        
         # 更新现有账号或创建新账号
         if account_index is not None and 0 <= account_index < len(config["accounts"]):
             # 更新现有账号，保留原有的一些字段
@@ -2117,7 +2359,94 @@ def save_to_config(cookies_data: Dict[str, str], account_index: Optional[int] =
         import traceback
         traceback.print_exc()
 
-def refresh_single_account(account_idx: int, account: dict, headless: bool = True, mode: str = "auto") -> bool:
+def _emit_account_update_safe(account_idx: int):
+    """推送账号更新的 WebSocket 事件，失败不影响刷新流程"""
+    try:
+        from app.websocket_manager import emit_account_update
+        from app.account_manager import account_manager
+        with account_manager.lock:
+            updated_account = account_manager.accounts[account_idx].copy()
+        emit_account_update(account_idx, updated_account)
+    except Exception:
+        pass
+
+def _launch_login_context(p, headless: bool):
+    """启动浏览器并创建带反检测脚本的上下文，返回 (browser, context)"""
+    browser = _launch_login_browser(p, headless)
+    return browser, _new_login_context(browser)
+
+def _launch_login_browser(p, headless: bool):
+    """启动带反检测参数的 Chromium 浏览器"""
+    import os
+    
+    # Linux 系统需要添加额外的启动参数
+    launch_args = []
+    if os.name != 'nt':  # 非 Windows 系统
+        launch_args = ['--no-sandbox', '--disable-setuid-sandbox']
+    
+    # 添加反检测参数，降低被 reCAPTCHA 识别的风险
+    launch_args.extend([
+        '--disable-blink-features=AutomationControlled',  # 禁用自动化控制特征
+        '--disable-dev-shm-usage',  # 避免共享内存问题
+        '--no-first-run',  # 跳过首次运行
+        '--no-default-browser-check',  # 跳过默认浏览器检查
+        '--disable-infobars',  # 禁用信息栏
+        '--disable-web-security',  # 禁用 Web 安全（谨慎使用）
+        '--disable-features=IsolateOrigins,site-per-process',  # 禁用某些安全特性
+    ])
+    
+    browser = p.chromium.launch(headless=headless, args=launch_args)
+    print(f"[登录] ✓ 浏览器已启动")
+    return browser
+
+def _new_login_context(browser):
+    """在已启动的浏览器中创建带反检测脚本和请求拦截的上下文"""
+    # 创建浏览器上下文，使用真实的用户代理和视口
+    print(f"[登录] 正在创建浏览器上下文...")
+    context = browser.new_context(
+        viewport={"width": 1920, "height": 1080},
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        locale="zh-CN",
+        timezone_id="Asia/Shanghai",
+        # 添加额外的反检测措施
+        extra_http_headers={
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+        }
+    )
+    
+    # 注入脚本以隐藏自动化特征（增强版，更好地绕过 reCAPTCHA）
+    context.add_init_script(script=FINGERPRINT_INIT_JS)
+    # 拦截统计脚本、字体和装饰性图片，reCAPTCHA 的 anchor/bframe/userverify 等请求不受影响
+    # 注意：启用请求拦截后 Playwright 会禁用该上下文的 HTTP 缓存，复用上下文不会带来缓存收益
+    context.route(BLOCKED_RESOURCE_PATTERN, lambda route: route.abort())
+    print(f"[登录] ✓ 浏览器上下文已创建")
+    return context
+
+def _try_existing_cookie(account_idx: int, account: dict) -> bool:
+    """用账号现有的 Cookie 请求一次 getoxsrf，仍然有效时直接清除过期标记，无需启动浏览器登录
+    
+    过期标记可能来自临时的网络错误或服务端抖动，此时一次 HTTP 请求即可恢复账号。
+    """
+    session = SessionData(
+        secure_c_ses=account.get("secure_c_ses") or "",
+        host_c_oses=account.get("host_c_oses") or "",
+        csesidx=str(account.get("csesidx") or ""),
+        team_id=account.get("team_id") or None,
+    )
+    if not session.secure_c_ses or not session.csesidx:
+        return False
+    if not test_cookie_with_jwt(session):
+        return False
+    
+    print(f"[单个账号刷新] ✓ 账号 {account_idx} 现有 Cookie 仍然有效，跳过浏览器登录")
+    with _config_save_lock:
+        save_to_config(session, account_index=account_idx)
+    threading.Thread(target=_emit_account_update_safe, args=(account_idx,), daemon=True).start()
+    return True
+
+def refresh_single_account(account_idx: int, account: dict, headless: bool = True, mode: str = "auto", browser=None,
+                           check_existing_cookie: bool = False) -> bool:
     """刷新单个账号的 Cookie（使用临时邮箱方式）
     
     Args:
@@ -2128,17 +2457,24 @@ def refresh_single_account(account_idx: int, account: dict, headless: bool = Tru
             - "auto": 自动选择（优先 API 方式，整个流程失败后自动切换到浏览器方式重新执行）
             - "api": 强制使用 API 方式（整个流程使用 API 方式获取验证码）
             - "browser": 强制使用浏览器方式（整个流程使用浏览器方式获取验证码）
+        browser: 可选，复用的已启动浏览器（批量刷新时传入），每次登录在其中新建独立的上下文；为 None 时自行启动浏览器
+        check_existing_cookie: 登录前是否先用现有 Cookie 请求一次 getoxsrf，仍然有效时直接返回
+            （默认关闭：自动刷新前已实际验证过 Cookie 失效，手动刷新则是用户明确要求重新登录）
     
     Returns:
         bool: 是否刷新成功
     """
     import os
     
+    # 过期标记未经验证时（如命令行批量刷新读取的 JSON 标记），先检查现有 Cookie 是否其实仍然有效
+    if check_existing_cookie and _try_existing_cookie(account_idx, account):
+        return True
+    
     # 默认使用自动模式：先尝试 API 方式，失败后自动切换到浏览器方式
     if mode == "auto":
         # 先尝试 API 方式
         print(f"[登录] 尝试使用 API 方式刷新账号 {account_idx}...")
-        success = _refresh_single_account_internal(account_idx, account, headless, mode="api")
+        success = _refresh_single_account_internal(account_idx, account, headless, mode="api", browser=browser)
         
         if success:
             print(f"[登录] ✓ API 方式刷新账号 {account_idx} 成功")
@@ -2146,12 +2482,12 @@ def refresh_single_account(account_idx: int, account: dict, headless: bool = Tru
         else:
             # API 方式失败，自动切换到浏览器方式重新执行整个流程
             print(f"[登录] ⚠ API 方式刷新账号 {account_idx} 失败，自动切换到浏览器方式重新执行...")
-            return _refresh_single_account_internal(account_idx, account, headless, mode="browser")
+            return _refresh_single_account_internal(account_idx, account, headless, mode="browser", browser=browser)
     else:
         # 使用指定的模式（api 或 browser）
-        return _refresh_single_account_internal(account_idx, account, headless, mode=mode)
+        return _refresh_single_account_internal(account_idx, account, headless, mode=mode, browser=browser)
 
-def _refresh_single_account_internal(account_idx: int, account: dict, headless: bool = True, mode: str = "api") -> bool:
+def _refresh_single_account_internal(account_idx: int, account: dict, headless: bool = True, mode: str = "api", browser=None) -> bool:
     """刷新单个账号的 Cookie（内部实现函数）
     
     Args:
@@ -2161,6 +2497,7 @@ def _refresh_single_account_internal(account_idx: int, account: dict, headless:
         mode: 获取验证码的模式
             - "api": 强制使用 API 方式（整个流程使用 API 方式获取验证码）
             - "browser": 强制使用浏览器方式（整个流程使用浏览器方式获取验证码）
+        browser: 可选，复用的已启动浏览器，为 None 时自行启动浏览器
     
     Returns:
         bool: 是否刷新成功
@@ -2198,1421 +2535,617 @@ def _refresh_single_account_internal(account_idx: int, account: dict, headless:
         
         # 使用 Playwright 刷新
         import os
-        from playwright.sync_api import sync_playwright
+        from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
         
-        print(f"[登录] 正在启动浏览器...")
-        with sync_playwright() as p:
-            # Linux 系统需要添加额外的启动参数
-            launch_args = []
-            if os.name != 'nt':  # 非 Windows 系统
-                launch_args = ['--no-sandbox', '--disable-setuid-sandbox']
-            
-            # 添加反检测参数，降低被 reCAPTCHA 识别的风险
-            launch_args.extend([
-                '--disable-blink-features=AutomationControlled',  # 禁用自动化控制特征
-                '--disable-dev-shm-usage',  # 避免共享内存问题
-                '--no-first-run',  # 跳过首次运行
-                '--no-default-browser-check',  # 跳过默认浏览器检查
-                '--disable-infobars',  # 禁用信息栏
-                '--disable-web-security',  # 禁用 Web 安全（谨慎使用）
-                '--disable-features=IsolateOrigins,site-per-process',  # 禁用某些安全特性
-            ])
-            
-            browser = p.chromium.launch(headless=headless, args=launch_args)
-            print(f"[登录] ✓ 浏览器已启动")
+        with contextlib.ExitStack() as stack:
+            # 同一临时邮箱的登录串行执行（批量刷新多线程时，共用邮箱的账号不会互相取走验证码或重置对方的 last_max_id）
+            stack.enter_context(_tempmail_mailbox_lock(tempmail_url))
+            if browser is None:
+                print(f"[登录] 正在启动浏览器...")
+                p = stack.enter_context(sync_playwright())
+                browser, context = _launch_login_context(p, headless)
+                stack.callback(browser.close)
+            else:
+                # 复用批量刷新中已启动的浏览器，但每次登录都新建上下文：
+                # Firebase / Identity Toolkit 把登录状态存在 IndexedDB 和 localStorage 中，复用上下文会把上一个账号的状态带到下一个账号
+                context = _new_login_context(browser)
+                stack.callback(context.close)
             
-            # 创建浏览器上下文，使用真实的用户代理和视口
-            print(f"[登录] 正在创建浏览器上下文...")
-            context = browser.new_context(
-                viewport={"width": 1920, "height": 1080},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                locale="zh-CN",
-                timezone_id="Asia/Shanghai",
-                # 添加额外的反检测措施
-                extra_http_headers={
-                    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                }
-            )
+            # 创建两个标签页：一个用于临时邮箱，一个用于登录
+            print(f"[登录] 正在创建页面标签...")
+            email_page = context.new_page()
+            login_page = context.new_page()
+            print(f"[登录] ✓ 页面标签已创建")
             
-            # 注入脚本以隐藏自动化特征（增强版，更好地绕过 reCAPTCHA）
-            context.add_init_script("""
-                // 覆盖 navigator.webdriver
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-                
-                // 覆盖 chrome 对象
-                window.chrome = {
-                    runtime: {},
-                    loadTimes: function() {},
-                    csi: function() {},
-                    app: {}
-                };
-                
-                // 覆盖 permissions
-                const originalQuery = window.navigator.permissions.query;
-                window.navigator.permissions.query = (parameters) => (
-                    parameters.name === 'notifications' ?
-                        Promise.resolve({ state: Notification.permission }) :
-                        originalQuery(parameters)
-                );
-                
-                // 覆盖 plugins
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5]
-                });
-                
-                // 覆盖 languages
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['zh-CN', 'zh', 'en']
-                });
-                
-                // 覆盖 webdriver 相关属性
-                delete navigator.__proto__.webdriver;
-                
-                // 覆盖 getBattery
-                if (navigator.getBattery) {
-                    navigator.getBattery = () => Promise.resolve({
-                        charging: true,
-                        chargingTime: 0,
-                        dischargingTime: Infinity,
-                        level: 1
-                    });
-                }
+            try:
+                # 先发起登录页导航（只等到服务器开始响应），浏览器在后台加载登录页的同时获取临时邮箱
+                print(f"[登录] 正在导航到登录页面...")
+                acquire_login_slot()
+                login_page.goto(GEMINI_LOGIN_URL, wait_until="commit", timeout=30000)
                 
-                // 覆盖 connection
-                Object.defineProperty(navigator, 'connection', {
-                    get: () => ({
-                        effectiveType: '4g',
-                        rtt: 50,
-                        downlink: 10,
-                        saveData: false
-                    })
-                });
+                # 步骤1：获取临时邮箱
+                print(f"[登录] 正在获取临时邮箱地址...")
+                email = get_email_from_tempmail(email_page, tempmail_url)
                 
-                // 覆盖 hardwareConcurrency
-                Object.defineProperty(navigator, 'hardwareConcurrency', {
-                    get: () => 8
-                });
+                if not email:
+                    print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法获取邮箱")
+                    return False
+                print(f"[登录] ✓ 已获取临时邮箱: {email}")
                 
-                // 覆盖 deviceMemory
-                Object.defineProperty(navigator, 'deviceMemory', {
-                    get: () => 8
-                });
+                # 步骤2：在登录页面输入邮箱并点击继续，触发发送验证码邮件
+                # 只等 DOM 就绪再等邮箱输入框出现，不依赖 networkidle（reCAPTCHA 的周期请求可能让它一直等到超时）
+                login_page.wait_for_load_state("domcontentloaded", timeout=30000)
+                print(f"[登录] ✓ 已导航到登录页面")
                 
-                // 覆盖 canvas 指纹
-                const originalToDataURL = HTMLCanvasElement.prototype.toDataURL;
-                HTMLCanvasElement.prototype.toDataURL = function(type) {
-                    if (type === 'image/png') {
-                        return originalToDataURL.apply(this, arguments);
-                    }
-                    return originalToDataURL.apply(this, arguments);
-                };
-                
-                // 覆盖 WebGL 指纹
-                const getParameter = WebGLRenderingContext.prototype.getParameter;
-                WebGLRenderingContext.prototype.getParameter = function(parameter) {
-                    if (parameter === 37445) {
-                        return 'Intel Inc.';
-                    }
-                    if (parameter === 37446) {
-                        return 'Intel Iris OpenGL Engine';
-                    }
-                    return getParameter.apply(this, arguments);
-                };
-            """)
-            print(f"[登录] ✓ 浏览器上下文已创建")
-            
-            try:
-                # 创建两个标签页：一个用于临时邮箱，一个用于登录
-                print(f"[登录] 正在创建页面标签...")
-                email_page = context.new_page()
-                login_page = context.new_page()
-                print(f"[登录] ✓ 页面标签已创建")
+                # 定位器只构建一次，后续轮询和重试时复用（定位器是惰性的，页面跳转后仍然有效）
+                email_input = login_page.locator(EMAIL_INPUT_SELECTOR).first
+                continue_btn = login_page.locator(
+                    "button#log-in-button, button:has-text('Continue'), button:has-text('继续')"
+                ).first
+                resend_btn = login_page.locator(RESEND_BTN_SELECTOR).first
                 
                 try:
-                    # 步骤1：获取临时邮箱
-                    print(f"[登录] 正在获取临时邮箱地址...")
-                    email = get_email_from_tempmail(email_page, tempmail_url)
-                    
-                    if not email:
-                        print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法获取邮箱")
-                        return False
-                    print(f"[登录] ✓ 已获取临时邮箱: {email}")
-                    
-                    # 步骤2：在登录页面输入邮箱并点击继续，触发发送验证码邮件
-                    print(f"[登录] 正在导航到登录页面...")
-                    login_page.goto(GEMINI_LOGIN_URL, wait_until="networkidle", timeout=60000)
-                    print(f"[登录] ✓ 已导航到登录页面")
-                    login_page.wait_for_timeout(3000)
-                    
                     try:
-                        email_input = login_page.locator(
-                            "#email-input, input[aria-label='邮箱'], input[type='text'][name='loginHint']"
-                        ).first
-                        if email_input.is_visible():
-                            email_input.fill(email)
-                            # 调试日志已关闭
-                            # print(f"[登录] ✓ 已填写邮箱: {email}")
-                            login_page.wait_for_timeout(2000)
-                            
-                            # 点击继续，触发发送验证码邮件
-                            try:
-                                continue_btn = login_page.locator(
-                                    "button#log-in-button, button:has-text('Continue'), button:has-text('继续')"
-                                ).first
-                                if continue_btn.is_visible():
-                                    # 在点击前等待 reCAPTCHA 准备好
-                                    if wait_for_recaptcha_ready(login_page, timeout=5):
-                                        print("[登录] reCAPTCHA 已准备好，准备点击按钮...")
-                                    
-                                    # 调试日志已关闭
-                                    # print(f"[登录] 点击继续按钮前的 URL: {login_page.url}")
-                                    continue_btn.click()
-                                    # 调试日志已关闭
-                                    # print("[登录] ✓ 已点击继续按钮，等待验证码邮件发送...")
-                                    
-                                    # 点击后等待 reCAPTCHA 验证完成
+                        email_input.wait_for(state="visible", timeout=15000)
+                    except PlaywrightTimeoutError:
+                        pass
+                    if email_input.is_visible():
+                        email_input.fill(email)
+                        # 调试日志已关闭
+                        # print(f"[登录] ✓ 已填写邮箱: {email}")
+                        # 等待"继续"按钮可用即可点击，最多 5 秒
+                        try:
+                            login_page.wait_for_function(CONTINUE_BTN_ENABLED_JS, timeout=5000)
+                        except PlaywrightTimeoutError:
+                            pass
+                        
+                        # 点击继续，触发发送验证码邮件
+                        try:
+                            if continue_btn.is_visible():
+                                # 在点击前等待 reCAPTCHA 准备好
+                                if wait_for_recaptcha_ready(login_page, timeout=5):
+                                    print("[登录] reCAPTCHA 已准备好，准备点击按钮...")
+                                
+                                # 调试日志已关闭
+                                # print(f"[登录] 点击继续按钮前的 URL: {login_page.url}")
+                                # 点击的同时监听发送验证码接口的响应和验证码页面的导航响应，哪个先到就继续
+                                # 两者都说明 reCAPTCHA 已通过；发送接口返回成功是邮件已发出的直接依据，此时可以跳过后面的页面提示检测
+                                email_sent_by_response = False
+                                try:
+                                    with login_page.expect_response(
+                                        lambda r: SEND_CODE_RESPONSE_PATTERN.search(r.url) is not None or is_verify_page_url(r.url),
+                                        timeout=SEND_CODE_RESPONSE_TIMEOUT_MS,
+                                    ) as resp_info:
+                                        continue_btn.click()
+                                    send_resp = resp_info.value
+                                    if SEND_CODE_RESPONSE_PATTERN.search(send_resp.url):
+                                        print(f"[登录] ✓ 已收到发送验证码请求的响应: HTTP {send_resp.status}")
+                                        email_sent_by_response = send_resp.ok
+                                except PlaywrightTimeoutError:
+                                    # 未捕获到请求，回退到检查 reCAPTCHA 状态
                                     wait_for_recaptcha_complete(login_page, timeout=30)
-                                    
-                                    # 等待一下，让页面有时间响应（验证码邮件发送可能需要时间）
-                                    login_page.wait_for_timeout(3000)  # 等待3秒
-                                    
-                                    # 在等待跳转的过程中，也检查是否在登录页面上出现了成功提示框
+                                
+                                # 跳转到验证码页面或出现提示框，哪个先发生就继续（在页面内按帧判断，无需轮询；URL 条件与 is_verify_page_url 一致）
+                                try:
+                                    login_page.wait_for_function(
+                                        "() => (window.location.href.includes('accountverification') && window.location.href.includes('verify-oob-code'))"
+                                        f" || !!document.querySelector('{TOAST_ASIDE_SELECTOR}')",
+                                        timeout=30000,
+                                    )
+                                except PlaywrightTimeoutError:
+                                    pass
+                                except Exception:
+                                    # 页面跳转时执行上下文可能被销毁，交给下面的 wait_for_url 处理
+                                    pass
+                                
+                                # 在等待跳转的过程中，也检查是否在登录页面上出现了成功提示框
+                                try:
+                                    # 检查是否有成功提示框（可能在登录页面上短暂出现），文本过滤在浏览器内完成，一次查询返回数量
+                                    if login_page.locator(TOAST_SENT_DIV_SELECTOR).filter(has_text=EMAIL_SENT_TEXT_RE).count() > 0:
+                                        print("[登录] ✓ 在登录页面上检测到验证码已发送的成功提示")
+                                except:
+                                    pass
+                                
+                                # 等待页面跳转到验证码输入页面（由浏览器导航事件驱动，网络慢时最多等待 60 秒）
+                                # URL 状态：auth.business.gemini.google/login(/email) → accountverification.business.gemini.google/v1/verify-oob-code
+                                max_wait_redirect = 60
+                                try:
+                                    login_page.wait_for_url(
+                                        is_verify_page_url,
+                                        timeout=max_wait_redirect * 1000,
+                                    )
+                                    redirect_success = True
+                                except PlaywrightTimeoutError:
+                                    redirect_success = False
+                                
+                                if not redirect_success:
+                                    # 兜底：URL 未匹配但验证码输入框已出现
                                     try:
-                                        # 检查是否有成功提示框（可能在登录页面上短暂出现）
-                                        aside_check = login_page.locator("aside.zyTWof-Ng57nc").count()
-                                        if aside_check > 0:
-                                            sent_elements = login_page.locator("aside.zyTWof-Ng57nc div.zyTWof-gIZMF").all()
-                                            for sent_element in sent_elements:
-                                                try:
-                                                    text = sent_element.text_content() or ""
-                                                    if "验证码已发送" in text and "请查收您的邮件" in text:
-                                                        print("[登录] ✓ 在登录页面上检测到验证码已发送的成功提示")
-                                                        break
-                                                except:
-                                                    continue
-                                    except:
+                                        login_page.locator("input[name='pinInput']").wait_for(state="visible", timeout=5000)
+                                        redirect_success = True
+                                    except PlaywrightTimeoutError:
                                         pass
-                                    
-                                    # 等待页面响应和跳转（最多等待 30 秒，网络慢时需要更长时间）
-                                    # 调试日志已关闭
-                                    # print("[登录] 等待页面跳转到验证码输入页面...")
-                                    max_wait_redirect = 30  # 增加等待时间，适应网络慢的情况
-                                    waited_redirect = 0
-                                    redirect_success = False
-                                    
-                                    while waited_redirect < max_wait_redirect:
-                                        current_url_after_click = login_page.url
-                                        
-                                        # 识别不同的 URL 状态：
-                                        # 1. auth.business.gemini.google/login - 输入邮箱页面
-                                        # 2. auth.business.gemini.google/login/email - 已输入邮箱后的页面（可能显示错误或等待跳转）
-                                        # 3. accountverification.business.gemini.google/v1/verify-oob-code - 验证码输入页面
-                                        
-                                        # 如果仍在 auth.business.gemini.google/login 或 login/email 页面，说明网络慢，继续等待
-                                        if ("auth.business.gemini.google" in current_url_after_click 
-                                            and "accountverification" not in current_url_after_click):
-                                            # 检查是否是 login/email 页面（已输入邮箱后的页面）
-                                            if "/login/email" in current_url_after_click:
-                                                # 检查是否有错误提示
-                                                try:
-                                                    page_text = login_page.locator("body").text_content() or ""
-                                                    if "server cannot process" in page_text.lower() or "try something else" in page_text.lower():
-                                                        print("[登录] ⚠ 检测到服务器错误页面，可能需要重新输入邮箱")
-                                                        # 可以尝试重新填写邮箱，或者返回错误
-                                                        # 这里先继续等待，看是否会跳转
-                                                except:
-                                                    pass
-                                            # 继续等待跳转到验证码页面
-                                            # 调试日志已关闭
-                                            # print(f"[登录] 仍在 auth 页面，等待跳转到验证码页面... (已等待 {waited_redirect}秒)")
-                                            login_page.wait_for_timeout(2000)
-                                            waited_redirect += 2
-                                            continue
+                                
+                                # 跳转等待结束后只读取一次 URL，下面的判断和日志都复用它
+                                current_url = login_page.url
+                                if not redirect_success:
+                                    if "/login/email" in current_url:
+                                        try:
+                                            if (login_page.get_by_text("server cannot process").count()
+                                                    or login_page.get_by_text("try something else").count()):
+                                                print("[登录] ⚠ 检测到服务器错误页面，可能需要重新输入邮箱")
+                                        except:
+                                            pass
+                                    print(f"[登录] ✗ 等待跳转超时（{max_wait_redirect}秒），无法跳转到验证码页面，当前 URL: {current_url}")
+                                
+                                # 确认已跳转到验证码页面后，等待并检测验证码邮件发送成功的提示
+                                if redirect_success:
+                                    # 再次验证当前 URL，确保真的在验证码页面
+                                    print(f"[登录] 当前 URL: {current_url}")
+                                    if is_verify_page_url(current_url):
+                                        print(f"[登录] ✓ 已确认跳转到验证码页面")
+                                        print(f"[登录] 使用的邮箱地址: {email}")
                                         
-                                        # 检查是否跳转到验证码输入页面
-                                        code_input_check = login_page.locator("input[name='pinInput'], input[type='text']:not([name='loginHint'])").first
-                                        if code_input_check.is_visible():
-                                            # 调试日志已关闭
-                                            # print(f"[登录] ✓ 确认已跳转到验证码输入页面，当前 URL: {login_page.url}")
-                                            # print("[登录] ✓ 验证码邮件应该已发送")
-                                            redirect_success = True
-                                            break
+                                        # 等待并检测"验证码已发送"的提示框元素
+                                        # 根据实际页面分析，提示框是一个 <aside> 元素，包含 <div class="zyTWof-gIZMF">
+                                        print("[登录] 等待验证码邮件发送成功的提示框...")
                                         
-                                        # 检查是否在验证码输入页面（通过 URL）
-                                        # 必须是 accountverification.business.gemini.google/v1/verify-oob-code
-                                        if ("accountverification" in current_url_after_click 
-                                            and "verify-oob-code" in current_url_after_click):
-                                            # 调试日志已关闭
-                                            # print(f"[登录] ✓ 已跳转到验证码页面，当前 URL: {current_url_after_click}")
-                                            redirect_success = True
-                                            break
+                                        max_wait_sent = get_max_wait_sent()  # 按历史实际延迟调整，样本不足时为 90 秒
+                                        email_sent_confirmed = email_sent_by_response
                                         
-                                        login_page.wait_for_timeout(2000)
-                                        waited_redirect += 2
-                                    
-                                    if not redirect_success:
-                                        current_url_final = login_page.url
-                                        # 如果仍在 auth 页面，说明网络慢或有问题，需要继续等待
-                                        if ("auth.business.gemini.google" in current_url_final 
-                                            and "accountverification" not in current_url_final):
-                                            print(f"[登录] ⚠ 等待跳转超时（{max_wait_redirect}秒），仍在 auth 页面，继续等待跳转到验证码页面...")
-                                            # 继续等待，直到跳转到验证码页面（最多再等待 30 秒）
-                                            max_wait_additional = 30
-                                            waited_additional = 0
-                                            while waited_additional < max_wait_additional:
-                                                current_url_additional = login_page.url
-                                                # 检查是否跳转到验证码页面（必须是 verify-oob-code）
-                                                if ("accountverification" in current_url_additional 
-                                                    and "verify-oob-code" in current_url_additional):
-                                                    print(f"[登录] ✓ 已跳转到验证码页面: {current_url_additional}")
-                                                    redirect_success = True
-                                                    break
-                                                # 如果仍在 auth 页面，继续等待
-                                                if ("auth.business.gemini.google" in current_url_additional 
-                                                    and "accountverification" not in current_url_additional):
-                                                    login_page.wait_for_timeout(2000)
-                                                    waited_additional += 2
-                                                    continue
-                                                # 其他情况，可能已经跳转，检查验证码输入框
-                                                code_input_check = login_page.locator("input[name='pinInput'], input[type='text']:not([name='loginHint'])").first
-                                                if code_input_check.is_visible():
-                                                    redirect_success = True
-                                                    break
-                                                login_page.wait_for_timeout(2000)
-                                                waited_additional += 2
-                                            
-                                            if not redirect_success:
-                                                print(f"[登录] ✗ 等待跳转超时（总计 {max_wait_redirect + max_wait_additional}秒），无法跳转到验证码页面")
-                                                return False
+                                        if email_sent_confirmed:
+                                            print("[登录] ✓ 发送验证码接口已返回成功，跳过页面提示检测")
                                         else:
-                                            # 调试日志已关闭
-                                            # print(f"[登录] ⚠ 等待跳转超时（{max_wait_redirect}秒），当前 URL: {current_url_final}")
-                                            # print("[登录] ⚠ 可能未完全跳转到验证码输入页面，继续尝试...")
-                                            pass
-                                    
-                                    # 确认已跳转到验证码页面后，等待并检测验证码邮件发送成功的提示
-                                    if redirect_success:
-                                        # 再次验证当前 URL，确保真的在验证码页面
-                                        final_url_verify = login_page.url
-                                        print(f"[登录] 当前 URL: {final_url_verify}")
-                                        if ("accountverification" in final_url_verify 
-                                            and "verify-oob-code" in final_url_verify):
-                                            print(f"[登录] ✓ 已确认跳转到验证码页面")
-                                            print(f"[登录] 使用的邮箱地址: {email}")
-                                            
-                                            # 等待并检测"验证码已发送"的提示框元素
-                                            # 根据实际页面分析，提示框是一个 <aside> 元素，包含 <div class="zyTWof-gIZMF">
-                                            print("[登录] 等待验证码邮件发送成功的提示框...")
-                                            
-                                            max_wait_sent = 90  # 增加等待时间到 90 秒（无头模式可能需要更长时间，且不使用方式4）
-                                            waited_sent = 0
-                                            email_sent_confirmed = False
-                                            resend_already_clicked = False  # 记录是否已经点击过"重新发送验证码"
-                                            
-                                            # 先等待页面稳定（无头模式下可能需要更多时间）
-                                            # 由于 reCAPTCHA 验证完成后页面才跳转，验证码邮件可能还在发送中
-                                            # 增加等待时间，让验证码邮件有时间发送成功并显示提示框
-                                            login_page.wait_for_timeout(5000)  # 等待 5 秒让页面加载
-                                            
-                                            # 在验证码页面，可能需要等待 reCAPTCHA 完成后，"重新发送验证码"按钮才会出现
-                                            # 先检查并等待 reCAPTCHA 完成（如果存在）
-                                            print("[登录] 检查验证码页面的 reCAPTCHA 状态...")
-                                            if wait_for_recaptcha_ready(login_page, timeout=5):
-                                                print("[登录] ✓ 检测到验证码页面的 reCAPTCHA iframe，等待 reCAPTCHA 验证完成...")
-                                                wait_for_recaptcha_complete(login_page, timeout=30)
-                                            else:
-                                                print("[登录] ℹ 验证码页面未检测到 reCAPTCHA，继续等待按钮出现...")
-                                            
-                                            # 在跳转到验证码页面后，需要先等待"重新发送验证码"按钮出现
-                                            # 这表示页面已经加载完成，然后才会出现"验证码已发送"的提示框
-                                            # 根据观察，按钮可能需要等待 reCAPTCHA 完成或页面加载完成后才会出现
-                                            print("[登录] 等待重新发送验证码按钮出现（表示页面已加载完成）...")
-                                            resend_btn_selectors_wait = [
-                                                "button[aria-label='重新发送验证码']",
-                                                "button:has-text('重新发送验证码')",
-                                                "button:has-text('重新发送')",
-                                                "button:has-text('Resend')",
-                                                "//button[contains(., '重新发送')]",
-                                                "//button[contains(., 'Resend')]",
-                                            ]
-                                            resend_btn_found = False
-                                            max_wait_resend_btn = 30  # 最多等待30秒
-                                            waited_resend_btn = 0
-                                            while waited_resend_btn < max_wait_resend_btn and not resend_btn_found:
-                                                for selector_wait in resend_btn_selectors_wait:
-                                                    try:
-                                                        if selector_wait.startswith("//"):
-                                                            resend_btn_wait = login_page.locator(selector_wait).first
-                                                        else:
-                                                            resend_btn_wait = login_page.locator(selector_wait).first
-                                                        btn_count_wait = resend_btn_wait.count()
-                                                        if btn_count_wait > 0:
-                                                            try:
-                                                                resend_btn_wait.wait_for(state="visible", timeout=2000)
-                                                                resend_btn_found = True
-                                                                print(f"[登录] ✓ 重新发送验证码按钮已出现（选择器: {selector_wait}），等待验证码已发送提示框...")
-                                                                break
-                                                            except:
-                                                                continue
-                                                    except:
-                                                        continue
-                                                if not resend_btn_found:
-                                                    login_page.wait_for_timeout(2000)
-                                                    waited_resend_btn += 2
-                                            
-                                            if not resend_btn_found:
-                                                print("[登录] ⚠ 等待30秒后仍未找到重新发送验证码按钮，继续检测提示框...")
+                                            # 所有"已发送"信号（提示框文本、"重新发送验证码"按钮可用）合并为一个页面内判断，哪个先出现就返回哪个
+                                            # 由页面内的 MutationObserver 在提示框 / 按钮变化时写入结果，Python 端只读取一个全局变量
+                                            try:
+                                                login_page.evaluate(EMAIL_SENT_OBSERVER_JS)
+                                                sent_signal_js = EMAIL_SENT_OR_ERROR_JS
+                                            except Exception:
+                                                sent_signal_js = EMAIL_SENT_SIGNAL_JS
+                                            try:
+                                                sent_wait_start = time.time()
+                                                sent_signal = login_page.wait_for_function(sent_signal_js, timeout=max_wait_sent * 1000).json_value()
+                                                if sent_signal == "error":
+                                                    print(f"[登录] ✗ 错误提示（出了点问题）持续 {EMAIL_ERROR_PERSIST_MS // 1000} 秒仍未出现已发送提示，停止等待")
+                                                else:
+                                                    email_sent_confirmed = True
+                                                    record_email_sent_wait(time.time() - sent_wait_start)
+                                                if sent_signal == "resend":
+                                                    print("[登录] ✓ 检测到重新发送验证码按钮出现且可用，视为验证码已发送成功")
+                                                elif sent_signal == "toast":
+                                                    print("[登录] ✓ 检测到验证码已发送的提示框")
+                                            except PlaywrightTimeoutError:
+                                                print(f"[登录] ✗ 等待超时（{max_wait_sent}秒），未检测到验证码邮件发送成功的提示")
+                                                # 超时也记录一次（按上限计），否则只有成功的快样本会被记录，等待上限只会越调越短
+                                                record_email_sent_wait(max_wait_sent)
+                                        
+                                        if email_sent_confirmed:
+                                            print("[登录] ✓ 检测到验证码邮件发送成功的提示，开始获取验证码...")
+                                            # 为了确保邮件发送成功，在确认验证码已发送成功后，再点击一次"重新发送验证码"按钮
+                                            if email_sent_by_response:
+                                                print("[登录] ℹ 发送接口已确认邮件发出，无需再次点击重新发送验证码按钮")
                                             else:
-                                                # 如果找到了"重新发送验证码"按钮，也将其视为验证码已发送成功的标志
-                                                # 因为有时候不会出现"验证码已发送"的提示框，但按钮出现就表示验证码已发送
-                                                print("[登录] ✓ 检测到重新发送验证码按钮出现，视为验证码已发送成功")
-                                                email_sent_confirmed = True
-                                            
-                                            # 等待按钮出现后，再等待一下让"验证码已发送"提示框出现（如果还没有确认）
-                                            if not email_sent_confirmed:
-                                                login_page.wait_for_timeout(3000)  # 额外等待 3 秒
-                                            
-                                            while waited_sent < max_wait_sent and not email_sent_confirmed:
+                                                # 再点击一次"重新发送验证码"按钮，确保邮件发送成功
+                                                print("[登录] 为了确保邮件发送成功，再点击一次重新发送验证码按钮...")
                                                 try:
-                                                    # 在检测循环中，也检查"重新发送验证码"按钮是否出现
-                                                    # 如果按钮出现且可见，也视为验证码已发送成功
-                                                    if not resend_btn_found:
-                                                        for selector_check in resend_btn_selectors_wait:
-                                                            try:
-                                                                if selector_check.startswith("//"):
-                                                                    resend_btn_check = login_page.locator(selector_check).first
-                                                                else:
-                                                                    resend_btn_check = login_page.locator(selector_check).first
-                                                                btn_count_check = resend_btn_check.count()
-                                                                if btn_count_check > 0:
-                                                                    try:
-                                                                        resend_btn_check.wait_for(state="visible", timeout=1000)
-                                                                        is_disabled_check = resend_btn_check.is_disabled()
-                                                                        # 如果按钮可见且未禁用，视为验证码已发送成功
-                                                                        if not is_disabled_check:
-                                                                            print(f"[登录] ✓ 检测到重新发送验证码按钮出现且可用（选择器: {selector_check}），视为验证码已发送成功")
-                                                                            email_sent_confirmed = True
-                                                                            resend_btn_found = True
-                                                                            break
-                                                                    except:
-                                                                        continue
-                                                            except:
-                                                                continue
-                                                        if email_sent_confirmed:
-                                                            break
-                                                    
-                                                    # 先检查是否有错误提示"出了点问题"，如果有则等待并点击"重新发送验证码"
+                                                    resend_clicked_ensure = False
                                                     try:
-                                                        page_text_check = login_page.locator("body").text_content() or ""
-                                                        if "出了点问题" in page_text_check and "请稍后再试" in page_text_check:
-                                                            print("[登录] ⚠ 检测到错误提示：出了点问题，等待重新发送验证码按钮出现...")
+                                                        # 在页面内等待按钮出现且可用，最多 5 秒（取代 count → wait_for → is_disabled 三次往返）
+                                                        try:
+                                                            login_page.wait_for_function(RESEND_BTN_READY_JS, timeout=5000)
+                                                            resend_ready = True
+                                                        except PlaywrightTimeoutError:
+                                                            resend_ready = False
+                                                        if resend_ready:
+                                                            # 在点击前等待 reCAPTCHA 准备好
+                                                            if wait_for_recaptcha_ready(login_page, timeout=5):
+                                                                print("[登录] reCAPTCHA 已准备好，准备点击重新发送验证码按钮...")
+                                                                
                                                             # 记录点击前的页面状态
                                                             try:
-                                                                before_click_url = login_page.url
-                                                                before_click_text = page_text_check[:300] if len(page_text_check) > 300 else page_text_check
-                                                                print(f"[登录] 点击前 URL: {before_click_url}")
-                                                                print(f"[登录] 点击前页面文本预览: {before_click_text}")
+                                                                # 验证码页面上的等待不会改变 URL，直接复用跳转结束时读取的 current_url
+                                                                print(f"[登录] 点击前 URL: {current_url}")
+                                                                if logger.isEnabledFor(logging.DEBUG):
+                                                                    logger.debug("[登录] 点击前页面文本预览: %s", login_page.evaluate(BODY_TEXT_PREVIEW_JS))
                                                             except:
                                                                 pass
-                                                            
-                                                            resend_btn_selectors = [
-                                                                "button[aria-label='重新发送验证码']",
-                                                                "button:has-text('重新发送验证码')",
-                                                                "button:has-text('重新发送')",
-                                                                "button:has-text('Resend')",
-                                                                "//button[contains(., '重新发送')]",
-                                                                "//button[contains(., 'Resend')]",
-                                                            ]
-                                                            resend_clicked = False
-                                                            clicked_selector = None
-                                                            # 等待按钮出现（最多等待10秒）
-                                                            max_wait_btn = 10
-                                                            waited_btn = 0
-                                                            while waited_btn < max_wait_btn and not resend_clicked:
-                                                                for selector in resend_btn_selectors:
-                                                                    try:
-                                                                        if selector.startswith("//"):
-                                                                            resend_btn = login_page.locator(selector).first
-                                                                        else:
-                                                                            resend_btn = login_page.locator(selector).first
-                                                                        # 等待按钮可见且未禁用
-                                                                        btn_count = resend_btn.count()
-                                                                        if btn_count > 0:
-                                                                            try:
-                                                                                resend_btn.wait_for(state="visible", timeout=2000)
-                                                                                
-                                                                                # 在点击按钮前等待 reCAPTCHA 准备好
-                                                                                if wait_for_recaptcha_ready(login_page, timeout=5):
-                                                                                    print("[登录] reCAPTCHA 已准备好，准备点击按钮...")
-                                                                                
-                                                                                is_disabled = resend_btn.is_disabled()
-                                                                                if not is_disabled:
-                                                                                    # 记录点击前的按钮状态
-                                                                                    try:
-                                                                                        btn_text = resend_btn.text_content() or ""
-                                                                                        print(f"[登录] 找到按钮 (选择器: {selector}): 文本='{btn_text}', 禁用={is_disabled}")
-                                                                                    except:
-                                                                                        print(f"[登录] 找到按钮 (选择器: {selector}): 禁用={is_disabled}")
-                                                                                    
-                                                                                    # 模拟真实用户行为：先移动鼠标到按钮位置
-                                                                                    try:
-                                                                                        box = resend_btn.bounding_box()
-                                                                                        if box:
-                                                                                            # 随机移动到按钮附近，模拟真实鼠标移动
-                                                                                            login_page.mouse.move(
-                                                                                                box['x'] + box['width'] / 2 + random.uniform(-5, 5),
-                                                                                                box['y'] + box['height'] / 2 + random.uniform(-5, 5)
-                                                                                            )
-                                                                                            login_page.wait_for_timeout(random.randint(100, 300))  # 随机延迟100-300ms
-                                                                                    except:
-                                                                                        pass
-                                                                                    
-                                                                                    # 点击按钮（使用更真实的点击方式，带随机延迟）
-                                                                                    resend_btn.click(delay=random.randint(50, 150))  # 随机延迟50-150ms
-                                                                                    clicked_selector = selector
-                                                                                    print(f"[登录] ✓ 已点击重新发送验证码按钮 (选择器: {selector})")
-                                                                                    
-                                                                                    # 点击后等待 reCAPTCHA 验证完成
-                                                                                    wait_for_recaptcha_complete(login_page, timeout=30)
-                                                                                    
-                                                                                    # 等待页面响应（增加等待时间）
-                                                                                    login_page.wait_for_timeout(2000)  # 等待2秒让页面响应
-                                                                                    
-                                                                                    # 检查点击后的页面状态，并立即尝试检测成功提示
-                                                                                    try:
-                                                                                        after_click_url = login_page.url
-                                                                                        after_click_text = login_page.locator("body").text_content() or ""
-                                                                                        after_click_preview = after_click_text[:500] if len(after_click_text) > 500 else after_click_text
-                                                                                        print(f"[登录] 点击后 URL: {after_click_url}")
-                                                                                        print(f"[登录] 点击后页面文本预览: {after_click_preview}")
-                                                                                        
-                                                                                        # 检查是否有新的错误提示
-                                                                                        if "出了点问题" in after_click_text:
-                                                                                            print("[登录] ⚠ 点击后仍然显示错误提示：出了点问题")
-                                                                                        if "验证码已发送" in after_click_text or "请查收您的邮件" in after_click_text:
-                                                                                            print("[登录] ✓ 点击后检测到成功提示（页面文本）")
-                                                                                        
-                                                                                        # 立即检查页面是否有 aside 元素（在等待前检查，避免元素消失）
-                                                                                        aside_check = login_page.locator("aside.zyTWof-Ng57nc").count()
-                                                                                        div_check = login_page.locator("div.zyTWof-gIZMF").count()
-                                                                                        print(f"[登录] 点击后立即元素检查: aside.zyTWof-Ng57nc={aside_check}, div.zyTWof-gIZMF={div_check}")
-                                                                                        
-                                                                                        # 如果元素存在，立即尝试检测成功提示（避免等待后元素消失）
-                                                                                        if aside_check > 0:
-                                                                                            try:
-                                                                                                sent_elements = login_page.locator("aside.zyTWof-Ng57nc div.zyTWof-gIZMF").all()
-                                                                                                if sent_elements:
-                                                                                                    found_error = False
-                                                                                                    for sent_element in sent_elements:
-                                                                                                        try:
-                                                                                                            text = sent_element.text_content() or ""
-                                                                                                            print(f"[登录] 点击后立即检测 - 元素文本: {text[:100]}")
-                                                                                                            # 检查是否是成功提示
-                                                                                                            if "验证码已发送" in text and "请查收您的邮件" in text:
-                                                                                                                email_sent_confirmed = True
-                                                                                                                print(f"[登录] ✓ 点击后立即通过方式1检测到成功提示: {text}")
-                                                                                                                break
-                                                                                                            # 检查是否是错误提示
-                                                                                                            elif "出了点问题" in text or ("错误" in text and "请稍后再试" in text):
-                                                                                                                found_error = True
-                                                                                                                print(f"[登录] ⚠ 点击后检测到错误提示: {text[:100]}")
-                                                                                                                print(f"[登录] ℹ 错误提示框可能会自动消失，继续等待成功提示...")
-                                                                                                        except:
-                                                                                                            continue
-                                                                                                    if email_sent_confirmed:
-                                                                                                        print(f"[登录] ✓ 点击后立即检测到成功提示，将跳出检测循环")
-                                                                                                        break
-                                                                                                    # 如果只找到错误提示，继续等待（错误提示框可能会消失，然后出现成功提示）
-                                                                                                    if found_error and not email_sent_confirmed:
-                                                                                                        print(f"[登录] ℹ 检测到错误提示但未检测到成功提示，将等待更长时间（10秒）让成功提示出现...")
-                                                                                                        login_page.wait_for_timeout(10000)  # 等待10秒，让错误提示消失，成功提示出现
-                                                                                            except Exception as e:
-                                                                                                print(f"[登录] ⚠ 点击后立即检测元素时出错: {e}")
-                                                                                    except Exception as e:
-                                                                                        print(f"[登录] ⚠ 检查点击后页面状态时出错: {e}")
-                                                                                    
-                                                                                    resend_clicked = True
-                                                                                    resend_already_clicked = True  # 标记已经点击过
-                                                                                    # 如果已经检测到成功提示，跳出按钮查找循环
-                                                                                    if email_sent_confirmed:
-                                                                                        break
-                                                                                    break
-                                                                                else:
-                                                                                    if waited_btn == 0:
-                                                                                        print(f"[登录] 按钮 (选择器: {selector}) 存在但被禁用")
-                                                                            except Exception as e:
-                                                                                if waited_btn == 0:
-                                                                                    print(f"[登录] 等待按钮可见时出错 (选择器: {selector}): {str(e)[:100]}")
-                                                                        else:
-                                                                            if waited_btn == 0 and selector == resend_btn_selectors[0]:
-                                                                                print(f"[登录] 按钮 (选择器: {selector}) 未找到")
-                                                                    except Exception as e:
-                                                                        if waited_btn == 0:
-                                                                            print(f"[登录] 检查按钮时出错 (选择器: {selector}): {str(e)[:100]}")
-                                                                        continue
-                                                                if not resend_clicked:
-                                                                    login_page.wait_for_timeout(2000)
-                                                                    waited_btn += 2
-                                                            if not resend_clicked:
-                                                                print("[登录] ⚠ 等待10秒后仍未找到或无法点击重新发送验证码按钮")
-                                                                # 输出当前页面状态用于调试
-                                                                try:
-                                                                    debug_url = login_page.url
-                                                                    debug_text = login_page.locator("body").text_content() or ""
-                                                                    debug_preview = debug_text[:300] if len(debug_text) > 300 else debug_text
-                                                                    print(f"[登录] 调试信息 - 当前 URL: {debug_url}")
-                                                                    print(f"[登录] 调试信息 - 页面文本预览: {debug_preview}")
-                                                                except:
-                                                                    pass
-                                                            else:
-                                                                # 点击成功，如果还没有检测到成功提示，再等待一下让提示框出现
-                                                                if not email_sent_confirmed:
-                                                                    print("[登录] 等待提示框出现（额外等待3秒）...")
-                                                                    login_page.wait_for_timeout(3000)
-                                                                else:
-                                                                    print("[登录] ✓ 已在点击后立即检测到成功提示，跳过额外等待")
-                                                    except Exception as e:
-                                                        print(f"[登录] ⚠ 处理错误提示时出错: {e}")
-                                                        import traceback
-                                                        traceback.print_exc()
-                                                    
-                                                    # 方式1：检测提示框 <aside> 元素（最准确）
-                                                    # 提示框结构：<aside class="zyTWof-Ng57nc..."> -> <div class="zyTWof-YAxtVc"> -> <div class="zyTWof-gIZMF" id="c6">
-                                                    # 注意：在无头模式下，使用 attached 状态更可靠，因为元素可能在 DOM 中但视觉上不可见
-                                                    try:
-                                                        # 先检测 aside 元素是否已附加到 DOM（无头模式下更可靠）
-                                                        # 增加超时时间和重试逻辑，因为无头模式下可能需要更多时间
-                                                        aside_element = login_page.locator("aside.zyTWof-Ng57nc")
-                                                        # 在无头模式下，先等待一下，让元素有时间加载
-                                                        if waited_sent == 0:
-                                                            login_page.wait_for_timeout(3000)  # 初始等待3秒
-                                                        
-                                                        # 记录检测前的页面状态（仅在第一次或每10秒）
-                                                        if waited_sent == 0 or waited_sent % 10 == 0:
+                                                                
+                                                            # 点击按钮
+                                                            resend_btn.click(position=random_click_position(resend_btn), delay=random.randint(50, 150))
+                                                            print(f"[登录] ✓ 已点击重新发送验证码按钮（确保邮件发送成功）")
+                                                                
+                                                            # 点击后等待 reCAPTCHA 验证完成
+                                                            wait_for_recaptcha_complete(login_page, timeout=30)
+                                                                
+                                                            # 点击后检查页面是否有错误提示
                                                             try:
-                                                                current_url_debug = login_page.url
-                                                                page_text_debug = login_page.locator("body").text_content() or ""
-                                                                page_text_preview = page_text_debug[:200] if len(page_text_debug) > 200 else page_text_debug
-                                                                print(f"[登录] 方式1检测前 - URL: {current_url_debug}")
-                                                                print(f"[登录] 方式1检测前 - 页面文本预览: {page_text_preview}")
-                                                            except:
-                                                                pass
-                                                        
-                                                        # 尝试等待元素出现（最多等待5秒）
-                                                        try:
-                                                            aside_element.wait_for(state="attached", timeout=5000)
-                                                        except Exception as wait_e:
-                                                            # 如果等待超时，继续尝试检查元素是否存在
-                                                            if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                print(f"[登录] 方式1: 等待 aside 元素附加超时: {str(wait_e)[:100]}")
-                                                        
-                                                        # 检查元素是否存在
-                                                        aside_count = aside_element.count()
-                                                        if aside_count > 0:
-                                                            if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                print(f"[登录] 方式1: 找到 aside 元素（count={aside_count}）")
-                                                            # 元素存在，检测内部的提示文本元素（可能有多个，需要找到正确的）
-                                                            # 尝试直接查找包含文本的元素
-                                                            sent_elements = login_page.locator("aside.zyTWof-Ng57nc div.zyTWof-gIZMF").all()
-                                                            if sent_elements:
-                                                                if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                    print(f"[登录] 方式1: 找到 {len(sent_elements)} 个 div.zyTWof-gIZMF 元素")
-                                                                for sent_element in sent_elements:
-                                                                    try:
-                                                                        # 等待元素可见或附加
-                                                                        try:
-                                                                            sent_element.wait_for(state="attached", timeout=2000)
-                                                                        except:
-                                                                            pass
-                                                                        text = sent_element.text_content() or ""
-                                                                        if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                            print(f"[登录] 方式1: 检查元素文本: {text[:100]}")
-                                                                        if "验证码已发送" in text and "请查收您的邮件" in text:
-                                                                            email_sent_confirmed = True
-                                                                            print(f"[登录] ✓ 通过方式1（提示框 aside）检测到提示: {text}")
-                                                                            break
-                                                                    except Exception as elem_e:
-                                                                        if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                            print(f"[登录] 方式1: 检查元素时出错: {str(elem_e)[:100]}")
-                                                                        continue
-                                                                if email_sent_confirmed:
-                                                                    break
-                                                            else:
-                                                                if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                    print(f"[登录] 方式1: aside 元素存在（count={aside_count}），但内部 div.zyTWof-gIZMF 未找到")
-                                                                    # 尝试查找 aside 内的所有元素
-                                                                    try:
-                                                                        all_children = login_page.locator("aside.zyTWof-Ng57nc *").all()
-                                                                        print(f"[登录] 方式1: aside 内共有 {len(all_children)} 个子元素")
-                                                                        for i, child in enumerate(all_children[:5]):  # 只显示前5个
-                                                                            try:
-                                                                                child_tag = child.evaluate("el => el.tagName")
-                                                                                child_class = child.evaluate("el => el.className") or ""
-                                                                                print(f"[登录] 方式1: 子元素 {i+1}: {child_tag}, class={child_class[:50]}")
-                                                                            except:
-                                                                                pass
-                                                                    except:
-                                                                        pass
-                                                        else:
-                                                            if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                print(f"[登录] 方式1: aside.zyTWof-Ng57nc 元素未找到（可能还未加载，已等待 {waited_sent} 秒）")
-                                                                # 检查是否有其他 aside 元素
-                                                                try:
-                                                                    all_asides = login_page.locator("aside").all()
-                                                                    print(f"[登录] 方式1: 页面中共有 {len(all_asides)} 个 aside 元素")
-                                                                    for i, aside in enumerate(all_asides[:3]):  # 只显示前3个
-                                                                        try:
-                                                                            aside_class = aside.evaluate("el => el.className") or ""
-                                                                            print(f"[登录] 方式1: aside {i+1} class: {aside_class[:100]}")
-                                                                        except:
-                                                                            pass
-                                                                except:
-                                                                    pass
-                                                    except Exception as e:
-                                                        # 只在第一次或每10秒打印一次，避免日志过多
-                                                        if waited_sent == 0 or waited_sent % 10 == 0:
-                                                            print(f"[登录] 方式1（提示框 aside）检测失败: {str(e)[:100]}")
-                                                            import traceback
-                                                            traceback.print_exc()
-                                                    
-                                                    # 方式2：检测 div.zyTWof-gIZMF 元素（备用）
-                                                    # 在无头模式下，直接检测文本元素更可靠
-                                                    if not email_sent_confirmed:
-                                                        try:
-                                                            sent_element = login_page.locator("div.zyTWof-gIZMF")
-                                                            # 先检查元素是否存在
-                                                            element_count = sent_element.count()
-                                                            if element_count > 0:
-                                                                # 使用 attached 状态，因为无头模式下元素可能在 DOM 中
-                                                                # 增加超时时间
-                                                                try:
-                                                                    sent_element.wait_for(state="attached", timeout=5000)
-                                                                except:
-                                                                    pass
-                                                                # 获取所有匹配的元素，检查每个元素的文本
-                                                                all_elements = sent_element.all()
-                                                                for elem in all_elements:
-                                                                    try:
-                                                                        text = elem.text_content() or ""
-                                                                        if "验证码已发送" in text and "请查收您的邮件" in text:
-                                                                            email_sent_confirmed = True
-                                                                            print(f"[登录] ✓ 通过方式2（div.zyTWof-gIZMF）检测到提示: {text}")
-                                                                            break
-                                                                    except:
-                                                                        continue
-                                                                if email_sent_confirmed:
-                                                                    break
-                                                            else:
-                                                                if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                    print(f"[登录] 方式2: div.zyTWof-gIZMF 元素未找到（可能还未加载，已等待 {waited_sent} 秒）")
-                                                        except Exception as e:
-                                                            if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                print(f"[登录] 方式2（div.zyTWof-gIZMF）检测失败: {str(e)[:100]}")
-                                                    
-                                                    # 方式3：检测动态 ID（c1-c20，因为 ID 可能会变化）
-                                                    # 在无头模式下，通过文本内容匹配更可靠
-                                                    # 注意：需要检查所有可能的ID，因为提示框的ID可能不是固定的
-                                                    if not email_sent_confirmed:
-                                                        try:
-                                                            # 尝试匹配所有可能的 ID 模式（c1-c20）
-                                                            # 优先检查常见的 c6-c10，然后检查其他ID
-                                                            id_range = list(range(6, 11)) + list(range(1, 6)) + list(range(11, 21))
-                                                            found_elements = []
-                                                            for id_num in id_range:
-                                                                try:
-                                                                    sent_element = login_page.locator(f"#c{id_num}")
-                                                                    # 使用 count() 检查元素是否存在，比 wait_for 更快
-                                                                    element_count = sent_element.count()
-                                                                    if element_count > 0:  # 元素存在
-                                                                        # 尝试等待元素附加
-                                                                        try:
-                                                                            sent_element.wait_for(state="attached", timeout=2000)
-                                                                        except:
-                                                                            pass
-                                                                        text = sent_element.text_content() or ""
-                                                                        # 检查是否包含我们需要的文本
-                                                                        if "验证码已发送" in text and "请查收您的邮件" in text:
-                                                                            email_sent_confirmed = True
-                                                                            print(f"[登录] ✓ 通过方式3（ID #c{id_num}）检测到提示: {text}")
-                                                                            break
-                                                                        # 记录找到的元素（用于调试），但排除错误提示
-                                                                        elif "出了点问题" not in text and "错误" not in text:
-                                                                            found_elements.append(f"#c{id_num}: {text[:50]}")
-                                                                except:
-                                                                    continue
-                                                            if email_sent_confirmed:
-                                                                break
-                                                            # 如果找到元素但文本不匹配，打印调试信息（排除错误提示）
-                                                            if found_elements and (waited_sent == 0 or waited_sent % 10 == 0):
-                                                                print(f"[登录] 方式3: 找到元素但文本不匹配: {found_elements[:3]}")
-                                                        except Exception as e:
-                                                            if waited_sent == 0 or waited_sent % 10 == 0:
-                                                                print(f"[登录] 方式3（动态 ID）检测失败: {str(e)[:100]}")
-                                                    
-                                                    # 方式4已移除：页面文本检测不准确，只使用方式1-3（元素检测）
-                                                    
-                                                except Exception as e:
-                                                    if waited_sent % 10 == 0:
-                                                        print(f"[登录] 检测过程出错: {str(e)[:100]}")
-                                                
-                                                login_page.wait_for_timeout(2000)
-                                                waited_sent += 2
-                                                
-                                                # 每 10 秒打印一次等待状态（便于调试）
-                                                if waited_sent % 10 == 0 and waited_sent > 0:
-                                                    print(f"[登录] 仍在等待验证码邮件发送成功的提示框... (已等待 {waited_sent} 秒)")
-                                                    # 打印当前页面状态
-                                                    try:
-                                                        current_url = login_page.url
-                                                        print(f"[登录] 当前 URL: {current_url}")
+                                                                after_click_url_ensure = login_page.url
+                                                                print(f"[登录] 点击后 URL: {after_click_url_ensure}")
+                                                                    
+                                                                check_toast_after_resend(login_page, timeout=5)
+                                                            except Exception as check_e:
+                                                                print(f"[登录] ⚠ 检查页面状态时出错: {check_e}")
+                                                                
+                                                            resend_clicked_ensure = True
                                                     except:
                                                         pass
-                                            
-                                            if email_sent_confirmed:
-                                                print("[登录] ✓ 检测到验证码邮件发送成功的提示，开始获取验证码...")
-                                                # 为了确保邮件发送成功，在确认验证码已发送成功后，再点击一次"重新发送验证码"按钮
-                                                if resend_already_clicked:
-                                                    print("[登录] ℹ 已在检测循环中点击过重新发送验证码按钮，跳过重复点击")
-                                                else:
-                                                    # 再点击一次"重新发送验证码"按钮，确保邮件发送成功
-                                                    print("[登录] 为了确保邮件发送成功，再点击一次重新发送验证码按钮...")
-                                                    try:
-                                                        resend_btn_selectors_ensure = [
-                                                            "button[aria-label='重新发送验证码']",
-                                                            "button:has-text('重新发送验证码')",
-                                                            "button:has-text('重新发送')",
-                                                            "button:has-text('Resend')",
-                                                        ]
-                                                        resend_clicked_ensure = False
-                                                        for selector_ensure in resend_btn_selectors_ensure:
-                                                            try:
-                                                                resend_btn_ensure = login_page.locator(selector_ensure).first
-                                                                if resend_btn_ensure.count() > 0:
-                                                                    resend_btn_ensure.wait_for(state="visible", timeout=5000)
-                                                                    if not resend_btn_ensure.is_disabled():
-                                                                        # 在点击前等待 reCAPTCHA 准备好
-                                                                        if wait_for_recaptcha_ready(login_page, timeout=5):
-                                                                            print("[登录] reCAPTCHA 已准备好，准备点击重新发送验证码按钮...")
-                                                                        
-                                                                        # 模拟真实用户行为：先移动鼠标到按钮位置
-                                                                        try:
-                                                                            box = resend_btn_ensure.bounding_box()
-                                                                            if box:
-                                                                                login_page.mouse.move(
-                                                                                    box['x'] + box['width'] / 2 + random.uniform(-5, 5),
-                                                                                    box['y'] + box['height'] / 2 + random.uniform(-5, 5)
-                                                                                )
-                                                                                login_page.wait_for_timeout(random.randint(100, 300))
-                                                                        except:
-                                                                            pass
-                                                                        
-                                                                        # 记录点击前的页面状态
-                                                                        try:
-                                                                            before_click_url_ensure = login_page.url
-                                                                            before_click_text_ensure = login_page.locator("body").text_content() or ""
-                                                                            before_click_preview_ensure = before_click_text_ensure[:500] if len(before_click_text_ensure) > 500 else before_click_text_ensure
-                                                                            print(f"[登录] 点击前 URL: {before_click_url_ensure}")
-                                                                            print(f"[登录] 点击前页面文本预览: {before_click_preview_ensure}")
-                                                                        except:
-                                                                            pass
-                                                                        
-                                                                        # 点击按钮
-                                                                        resend_btn_ensure.click(delay=random.randint(50, 150))
-                                                                        print(f"[登录] ✓ 已点击重新发送验证码按钮（确保邮件发送成功）")
-                                                                        
-                                                                        # 点击后等待 reCAPTCHA 验证完成
-                                                                        wait_for_recaptcha_complete(login_page, timeout=30)
-                                                                        
-                                                                        # 等待一下让页面响应
-                                                                        login_page.wait_for_timeout(2000)
-                                                                        
-                                                                        # 点击后检查页面是否有错误提示
-                                                                        try:
-                                                                            after_click_url_ensure = login_page.url
-                                                                            print(f"[登录] 点击后 URL: {after_click_url_ensure}")
-                                                                            
-                                                                            # 先检查特定的错误提示元素（aside.zyTWof-Ng57nc 中的错误提示）
-                                                                            error_detected = False
-                                                                            error_text_found = ""
-                                                                            
-                                                                            try:
-                                                                                # 检查 aside 元素中的错误提示
-                                                                                aside_elements = login_page.locator("aside.zyTWof-Ng57nc").all()
-                                                                                for aside_elem in aside_elements:
-                                                                                    try:
-                                                                                        # 检查 aside 是否可见
-                                                                                        if aside_elem.is_visible():
-                                                                                            aside_text = aside_elem.text_content() or ""
-                                                                                            # 检查是否包含错误提示
-                                                                                            if "出了点问题" in aside_text and "请稍后再试" in aside_text:
-                                                                                                error_detected = True
-                                                                                                error_text_found = aside_text[:200]
-                                                                                                print(f"[登录] ⚠ 检测到错误提示元素（aside）: {error_text_found}")
-                                                                                                break
-                                                                                    except:
-                                                                                        continue
-                                                                            except:
-                                                                                pass
-                                                                            
-                                                                            # 如果没有在 aside 中找到，检查 div.zyTWof-gIZMF 中的错误提示
-                                                                            if not error_detected:
-                                                                                try:
-                                                                                    error_divs = login_page.locator("div.zyTWof-gIZMF").all()
-                                                                                    for error_div in error_divs:
-                                                                                        try:
-                                                                                            if error_div.is_visible():
-                                                                                                div_text = error_div.text_content() or ""
-                                                                                                # 检查是否包含错误提示
-                                                                                                if "出了点问题" in div_text and "请稍后再试" in div_text:
-                                                                                                    error_detected = True
-                                                                                                    error_text_found = div_text[:200]
-                                                                                                    print(f"[登录] ⚠ 检测到错误提示元素（div）: {error_text_found}")
-                                                                                                    break
-                                                                                        except:
-                                                                                            continue
-                                                                                except:
-                                                                                    pass
-                                                                            
-                                                                            # 检查是否有成功提示（aside 或 div 中的成功提示）
-                                                                            success_detected = False
-                                                                            success_text_found = ""
-                                                                            
-                                                                            try:
-                                                                                # 检查 aside 元素中的成功提示
-                                                                                aside_elements = login_page.locator("aside.zyTWof-Ng57nc").all()
-                                                                                for aside_elem in aside_elements:
-                                                                                    try:
-                                                                                        if aside_elem.is_visible():
-                                                                                            aside_text = aside_elem.text_content() or ""
-                                                                                            # 检查是否包含成功提示
-                                                                                            if "验证码已发送" in aside_text and "请查收您的邮件" in aside_text:
-                                                                                                success_detected = True
-                                                                                                success_text_found = aside_text[:200]
-                                                                                                print(f"[登录] ✓ 检测到成功提示元素（aside）: {success_text_found}")
-                                                                                                break
-                                                                                    except:
-                                                                                        continue
-                                                                            except:
-                                                                                pass
-                                                                            
-                                                                            if not success_detected:
-                                                                                try:
-                                                                                    success_divs = login_page.locator("div.zyTWof-gIZMF").all()
-                                                                                    for success_div in success_divs:
-                                                                                        try:
-                                                                                            if success_div.is_visible():
-                                                                                                div_text = success_div.text_content() or ""
-                                                                                                # 检查是否包含成功提示
-                                                                                                if "验证码已发送" in div_text and "请查收您的邮件" in div_text:
-                                                                                                    success_detected = True
-                                                                                                    success_text_found = div_text[:200]
-                                                                                                    print(f"[登录] ✓ 检测到成功提示元素（div）: {success_text_found}")
-                                                                                                    break
-                                                                                        except:
-                                                                                            continue
-                                                                                except:
-                                                                                    pass
-                                                                            
-                                                                            # 输出检测结果
-                                                                            if error_detected:
-                                                                                print(f"[登录] ⚠ 检测到页面错误提示，可能的原因：页面显示错误提示，导致验证码邮件未发送成功")
-                                                                                if success_detected:
-                                                                                    print(f"[登录] ⚠ 同时也检测到成功提示，页面状态可能不稳定")
-                                                                            elif success_detected:
-                                                                                print(f"[登录] ✓ 检测到成功提示，验证码邮件应该已发送成功")
-                                                                            else:
-                                                                                print(f"[登录] ℹ 未检测到明显的错误或成功提示元素，页面状态正常")
-                                                                        except Exception as check_e:
-                                                                            print(f"[登录] ⚠ 检查页面状态时出错: {check_e}")
-                                                                        
-                                                                        resend_clicked_ensure = True
-                                                                        resend_already_clicked = True  # 标记已点击
-                                                                        break
-                                                            except:
-                                                                continue
-                                                        
-                                                        if not resend_clicked_ensure:
-                                                            print("[登录] ⚠ 未找到或无法点击重新发送验证码按钮，继续获取验证码...")
-                                                    except Exception as e:
-                                                        print(f"[登录] ⚠ 点击重新发送验证码按钮时出错: {e}，继续获取验证码...")
-                                            else:
-                                                print(f"[登录] ✗ 等待超时（{max_wait_sent}秒），未检测到验证码邮件发送成功的提示（方式1-3均失败）")
-                                                print("[登录] ✗ 验证码可能未发送成功，无法继续")
-                                                print("[登录] ℹ 提示：系统只使用元素检测方式（方式1-3），不使用页面文本检测")
-                                                return False
-                                            
-                                            login_page.wait_for_timeout(2000)  # 额外等待 2 秒，确保邮件已到达
+                                                    
+                                                    if not resend_clicked_ensure:
+                                                        print("[登录] ⚠ 未找到或无法点击重新发送验证码按钮，继续获取验证码...")
+                                                except Exception as e:
+                                                    print(f"[登录] ⚠ 点击重新发送验证码按钮时出错: {e}，继续获取验证码...")
                                         else:
-                                            print(f"[登录] ⚠ 警告：redirect_success=True 但 URL 不匹配验证码页面")
-                                            print(f"[登录] 当前 URL: {final_url_verify}")
-                                            print(f"[登录] 继续尝试等待跳转...")
-                                            # 继续等待跳转
-                                            login_page.wait_for_timeout(5000)
+                                            print("[登录] ✗ 验证码可能未发送成功，无法继续")
+                                            return False
                                     else:
-                                        # 如果未成功跳转，返回错误
-                                        print("[登录] ✗ 未能跳转到验证码页面，无法继续")
-                                        return False
+                                        print(f"[登录] ⚠ 警告：redirect_success=True 但 URL 不匹配验证码页面")
+                                        print(f"[登录] 当前 URL: {current_url}")
+                                        print(f"[登录] 继续尝试等待跳转...")
+                                        # 继续等待跳转，跳转完成即返回（最多 5 秒）
+                                        try:
+                                            login_page.wait_for_url(
+                                                is_verify_page_url,
+                                                timeout=5000,
+                                            )
+                                        except PlaywrightTimeoutError:
+                                            pass
                                 else:
-                                    # 调试日志已关闭
-                                    # print("[登录] ⚠ 未找到继续按钮，尝试按 Enter...")
-                                    email_input.press("Enter")
-                                    login_page.wait_for_timeout(5000)
-                            except Exception as e:
+                                    # 如果未成功跳转，返回错误
+                                    print("[登录] ✗ 未能跳转到验证码页面，无法继续")
+                                    return False
+                            else:
                                 # 调试日志已关闭
-                                # print(f"[登录] ⚠ 点击继续按钮时出错: {e}，尝试按 Enter...")
+                                # print("[登录] ⚠ 未找到继续按钮，尝试按 Enter...")
                                 email_input.press("Enter")
-                                login_page.wait_for_timeout(5000)
-                        else:
-                            print(f"[单个账号刷新] ✗ 账号 {account_idx} 未找到邮箱输入框")
-                            return False
-                    except Exception as e:
-                        print(f"[单个账号刷新] ✗ 账号 {account_idx} 填写邮箱时出错: {e}")
-                        import traceback
-                        traceback.print_exc()
+                                try:
+                                    login_page.wait_for_url(is_verify_page_url, timeout=15000)
+                                except PlaywrightTimeoutError:
+                                    pass
+                        except Exception as e:
+                            # 调试日志已关闭
+                            # print(f"[登录] ⚠ 点击继续按钮时出错: {e}，尝试按 Enter...")
+                            email_input.press("Enter")
+                            try:
+                                login_page.wait_for_url(is_verify_page_url, timeout=15000)
+                            except PlaywrightTimeoutError:
+                                pass
+                    else:
+                        print(f"[单个账号刷新] ✗ 账号 {account_idx} 未找到邮箱输入框")
                         return False
-                    
-                    # 确认已跳转到验证码页面后，才开始等待验证码邮件
-                    # 检查当前 URL，确保在验证码页面
-                    final_url_check = login_page.url
-                    print(f"[登录] 最终 URL 检查: {final_url_check}")
-                    if ("accountverification" not in final_url_check 
-                        or "verify-oob-code" not in final_url_check):
-                        # 如果不在验证码页面，尝试再次等待
-                        print(f"[登录] ⚠ 未在验证码页面，当前 URL: {final_url_check}")
-                        print("[登录] 等待跳转到验证码页面...")
-                        try:
-                            login_page.wait_for_url("**/accountverification.business.gemini.google/v1/verify-oob-code**", timeout=10000)
-                            print(f"[登录] ✓ 已跳转到验证码页面: {login_page.url}")
-                        except:
-                            print(f"[登录] ✗ 未能跳转到验证码页面，当前 URL: {login_page.url}")
-                            return False
+                except Exception as e:
+                    print(f"[单个账号刷新] ✗ 账号 {account_idx} 填写邮箱时出错: {type(e).__name__}: {e}")
+                    # 超时等常见错误只打印一行，完整堆栈只在 LOGIN_DEBUG=1 时输出
+                    logger.debug("[单个账号刷新] 填写邮箱时出错的堆栈", exc_info=True)
+                    return False
+                
+                # 确认已跳转到验证码页面后，才开始等待验证码邮件
+                # 已在验证码页面时 wait_for_url 立即返回，否则最多再等待 10 秒
+                try:
+                    login_page.wait_for_url(is_verify_page_url, timeout=10000)
+                    print(f"[登录] ✓ 确认在验证码页面: {login_page.url}")
+                except PlaywrightTimeoutError:
+                    print(f"[登录] ✗ 未能跳转到验证码页面，当前 URL: {login_page.url}")
+                    return False
+                
+                # 步骤3和4：获取验证码并登录（支持验证码错误时自动重试）
+                # 根据 mode 参数决定使用哪种方式获取验证码
+                if mode == "api":
+                    print(f"[登录] 使用 API 方式获取验证码（强制模式）")
+                    force_api_mode = True
+                    force_browser_mode = False
+                elif mode == "browser":
+                    print(f"[登录] 使用浏览器方式获取验证码（强制模式）")
+                    force_api_mode = False
+                    force_browser_mode = True
+                else:  # mode == "auto"
+                    print(f"[登录] 自动选择获取验证码方式（优先 API，失败后回退到浏览器）")
+                    force_api_mode = False
+                    force_browser_mode = False
+                
+                # 调试日志已关闭
+                # print(f"\n[账号 {account_idx}] 步骤3: 等待验证码邮件并获取验证码...")
+                max_retry = 3
+                retry_count = 0
+                success = False
+                # 无法判断是否有新邮件时的重试间隔：指数递增，封顶 5 秒
+                retry_delays = backoff_delays(start_ms=500, max_ms=5000)
+                use_browser_mode = force_browser_mode  # 如果强制使用浏览器方式，直接设置
+                limit_exceeded_detected = False  # 标志：是否检测到"验证码输入次数已超出上限"
+                
+                while retry_count < max_retry and not success:
+                    if retry_count > 0:
+                        # 调试日志已关闭
+                        # print(f"\n[账号 {account_idx}] 重试: 验证码错误，刷新邮件并重新获取验证码 (重试 {retry_count}/{max_retry-1})...")
+                        # 如果强制使用浏览器方式，或者检测到"验证码输入次数已超出上限"，或者重试次数超过1次，强制使用浏览器方式
+                        if force_browser_mode or limit_exceeded_detected or (not force_api_mode and retry_count >= 2):
+                            if not use_browser_mode:
+                                print(f"[临时邮箱] ⚠ API 方式获取验证码多次失败，切换到浏览器方式从临时邮箱获取验证码...")
+                                use_browser_mode = True
+                        
+                        if use_browser_mode:
+                            # 强制使用浏览器方式
+                            code = get_verification_code_from_tempmail_browser(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True)
+                        elif force_api_mode:
+                            # 强制使用 API 方式（即使失败也不切换到浏览器方式）
+                            code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True, account_config=account, force_api=True)
+                        else:
+                            # 自动模式：重试模式，立即刷新并提取，不等待
+                            code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True, account_config=account, force_api=False)
                     else:
-                        print(f"[登录] ✓ 确认在验证码页面: {final_url_check}")
-                    
-                    # 步骤3和4：获取验证码并登录（支持验证码错误时自动重试）
-                    # 根据 mode 参数决定使用哪种方式获取验证码
-                    if mode == "api":
-                        print(f"[登录] 使用 API 方式获取验证码（强制模式）")
-                        force_api_mode = True
-                        force_browser_mode = False
-                    elif mode == "browser":
-                        print(f"[登录] 使用浏览器方式获取验证码（强制模式）")
-                        force_api_mode = False
-                        force_browser_mode = True
-                    else:  # mode == "auto"
-                        print(f"[登录] 自动选择获取验证码方式（优先 API，失败后回退到浏览器）")
-                        force_api_mode = False
-                        force_browser_mode = False
-                    
-                    # 调试日志已关闭
-                    # print(f"\n[账号 {account_idx}] 步骤3: 等待验证码邮件并获取验证码...")
-                    max_retry = 3
-                    retry_count = 0
-                    success = False
-                    use_browser_mode = force_browser_mode  # 如果强制使用浏览器方式，直接设置
-                    limit_exceeded_detected = False  # 标志：是否检测到"验证码输入次数已超出上限"
+                        # 第一次：等待邮件到达
+                        if force_browser_mode:
+                            # 强制使用浏览器方式
+                            code = get_verification_code_from_tempmail_browser(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False)
+                        elif force_api_mode:
+                            # 强制使用 API 方式
+                            code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False, account_config=account, force_api=True)
+                        else:
+                            # 自动模式：优先尝试 API 方式
+                            code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False, account_config=account, force_api=False)
                     
-                    while retry_count < max_retry and not success:
+                    if not code:
                         if retry_count > 0:
-                            # 调试日志已关闭
-                            # print(f"\n[账号 {account_idx}] 重试: 验证码错误，刷新邮件并重新获取验证码 (重试 {retry_count}/{max_retry-1})...")
-                            # 如果强制使用浏览器方式，或者检测到"验证码输入次数已超出上限"，或者重试次数超过1次，强制使用浏览器方式
-                            if force_browser_mode or limit_exceeded_detected or (not force_api_mode and retry_count >= 2):
-                                if not use_browser_mode:
-                                    print(f"[临时邮箱] ⚠ API 方式获取验证码多次失败，切换到浏览器方式从临时邮箱获取验证码...")
-                                    use_browser_mode = True
-                            
-                            if use_browser_mode:
-                                # 强制使用浏览器方式
-                                code = get_verification_code_from_tempmail_browser(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True)
-                            elif force_api_mode:
-                                # 强制使用 API 方式（即使失败也不切换到浏览器方式）
-                                code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True, account_config=account, force_api=True)
-                            else:
-                                # 自动模式：重试模式，立即刷新并提取，不等待
-                                code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=True, account_config=account, force_api=False)
+                            print(f"[单个账号刷新] ✗ 账号 {account_idx} 重试时无法获取验证码")
                         else:
-                            # 第一次：等待邮件到达
-                            if force_browser_mode:
-                                # 强制使用浏览器方式
-                                code = get_verification_code_from_tempmail_browser(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False)
-                            elif force_api_mode:
-                                # 强制使用 API 方式
-                                code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False, account_config=account, force_api=True)
-                            else:
-                                # 自动模式：优先尝试 API 方式
-                                code = get_verification_code_from_tempmail(email_page, timeout=120, tempmail_url=tempmail_url, retry_mode=False, account_config=account, force_api=False)
+                            print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法获取验证码")
                         
-                        if not code:
-                            if retry_count > 0:
-                                print(f"[单个账号刷新] ✗ 账号 {account_idx} 重试时无法获取验证码")
-                            else:
-                                print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法获取验证码")
-                            
-                            # 如果 API 方式获取验证码失败，且还没有使用浏览器方式，尝试重新执行整个登录流程
-                            if not use_browser_mode and retry_count < max_retry - 1:
-                                print(f"[登录] ⚠ 获取验证码失败，将重新执行整个登录流程（重新输入邮箱并发送验证码）...")
-                                # 重新导航到登录页面
+                        # 如果 API 方式获取验证码失败，且还没有使用浏览器方式，尝试重新执行整个登录流程
+                        if not use_browser_mode and retry_count < max_retry - 1:
+                            print(f"[登录] ⚠ 获取验证码失败，将重新执行整个登录流程（重新输入邮箱并发送验证码）...")
+                            # 重新导航到登录页面
+                            try:
+                                login_page.goto(GEMINI_LOGIN_URL, wait_until="domcontentloaded", timeout=30000)
+                                
+                                # 重新输入邮箱
                                 try:
-                                    login_page.goto(GEMINI_LOGIN_URL, wait_until="networkidle", timeout=60000)
-                                    login_page.wait_for_timeout(3000)
+                                    email_input.wait_for(state="visible", timeout=15000)
+                                except PlaywrightTimeoutError:
+                                    pass
+                                if email_input.is_visible():
+                                    email_input.fill(email)
+                                    try:
+                                        login_page.wait_for_function(CONTINUE_BTN_ENABLED_JS, timeout=5000)
+                                    except PlaywrightTimeoutError:
+                                        pass
                                     
-                                    # 重新输入邮箱
-                                    email_input = login_page.locator(
-                                        "#email-input, input[aria-label='邮箱'], input[type='text'][name='loginHint']"
-                                    ).first
-                                    if email_input.is_visible():
-                                        email_input.fill(email)
-                                        login_page.wait_for_timeout(2000)
+                                    # 重新点击继续按钮
+                                    if continue_btn.is_visible():
+                                        # 在点击前等待 reCAPTCHA 准备好
+                                        if wait_for_recaptcha_ready(login_page, timeout=5):
+                                            print("[登录] reCAPTCHA 已准备好，准备点击按钮...")
                                         
-                                        # 重新点击继续按钮
-                                        continue_btn = login_page.locator(
-                                            "button#log-in-button, button:has-text('Continue'), button:has-text('继续')"
-                                        ).first
-                                        if continue_btn.is_visible():
-                                            # 在点击前等待 reCAPTCHA 准备好
-                                            if wait_for_recaptcha_ready(login_page, timeout=5):
-                                                print("[登录] reCAPTCHA 已准备好，准备点击按钮...")
-                                            
-                                            continue_btn.click()
-                                            
-                                            # 点击后等待 reCAPTCHA 验证完成
-                                            wait_for_recaptcha_complete(login_page, timeout=30)
-                                            
-                                            # 等待页面跳转到验证码页面
-                                            login_page.wait_for_timeout(5000)
-                                            
-                                            # 等待跳转到验证码页面（最多等待30秒）
-                                            max_wait_redirect_retry = 30
-                                            waited_redirect_retry = 0
+                                        continue_btn.click()
+                                        
+                                        # 点击后等待 reCAPTCHA 验证完成
+                                        wait_for_recaptcha_complete(login_page, timeout=30)
+                                        
+                                        # 等待跳转到验证码页面（最多等待35秒）
+                                        try:
+                                            login_page.wait_for_url(
+                                                is_verify_page_url,
+                                                timeout=35000,
+                                            )
+                                            redirect_success_retry = True
+                                            print(f"[登录] ✓ 已重新跳转到验证码页面: {login_page.url}")
+                                        except PlaywrightTimeoutError:
                                             redirect_success_retry = False
+                                        
+                                        if redirect_success_retry:
+                                            # 等待"重新发送验证码"按钮出现
+                                            print("[登录] 等待重新发送验证码按钮出现...")
+                                            try:
+                                                login_page.wait_for_function(RESEND_BTN_READY_JS, timeout=30000)
+                                                print(f"[登录] ✓ 重新发送验证码按钮已出现")
+                                            except PlaywrightTimeoutError:
+                                                pass
                                             
-                                            while waited_redirect_retry < max_wait_redirect_retry:
-                                                current_url_retry = login_page.url
-                                                if ("accountverification" in current_url_retry 
-                                                    and "verify-oob-code" in current_url_retry):
-                                                    redirect_success_retry = True
-                                                    print(f"[登录] ✓ 已重新跳转到验证码页面: {current_url_retry}")
-                                                    break
-                                                login_page.wait_for_timeout(2000)
-                                                waited_redirect_retry += 2
-                                            
-                                            if redirect_success_retry:
-                                                # 等待"重新发送验证码"按钮出现
-                                                print("[登录] 等待重新发送验证码按钮出现...")
-                                                resend_btn_selectors_retry = [
-                                                    "button[aria-label='重新发送验证码']",
-                                                    "button:has-text('重新发送验证码')",
-                                                    "button:has-text('重新发送')",
-                                                    "button:has-text('Resend')",
-                                                ]
-                                                resend_btn_found_retry = False
-                                                max_wait_resend_btn_retry = 30
-                                                waited_resend_btn_retry = 0
-                                                
-                                                while waited_resend_btn_retry < max_wait_resend_btn_retry and not resend_btn_found_retry:
-                                                    for selector_retry in resend_btn_selectors_retry:
-                                                        try:
-                                                            resend_btn_retry = login_page.locator(selector_retry).first
-                                                            if resend_btn_retry.count() > 0:
-                                                                resend_btn_retry.wait_for(state="visible", timeout=2000)
-                                                                resend_btn_found_retry = True
-                                                                print(f"[登录] ✓ 重新发送验证码按钮已出现")
-                                                                break
-                                                        except:
-                                                            continue
-                                                    if not resend_btn_found_retry:
-                                                        login_page.wait_for_timeout(2000)
-                                                        waited_resend_btn_retry += 2
-                                                
-                                                # 等待一下让验证码邮件发送
-                                                login_page.wait_for_timeout(3000)
-                                                
-                                                # 继续重试获取验证码
-                                                retry_count += 1
-                                                continue
-                                            else:
-                                                print(f"[登录] ✗ 重新执行登录流程后未能跳转到验证码页面")
-                                                break
+                                            # 继续重试获取验证码（获取验证码时会轮询邮箱，无需再固定等待邮件发送）
+                                            retry_count += 1
+                                            continue
                                         else:
-                                            print(f"[登录] ✗ 重新执行登录流程时未找到继续按钮")
+                                            print(f"[登录] ✗ 重新执行登录流程后未能跳转到验证码页面")
                                             break
                                     else:
-                                        print(f"[登录] ✗ 重新执行登录流程时未找到邮箱输入框")
+                                        print(f"[登录] ✗ 重新执行登录流程时未找到继续按钮")
                                         break
-                                except Exception as e:
-                                    print(f"[登录] ✗ 重新执行登录流程时出错: {e}")
+                                else:
+                                    print(f"[登录] ✗ 重新执行登录流程时未找到邮箱输入框")
                                     break
-                            else:
+                            except Exception as e:
+                                print(f"[登录] ✗ 重新执行登录流程时出错: {e}")
                                 break
+                        else:
+                            break
+                    
+                    # 调试日志已关闭
+                    # print(f"\n[账号 {account_idx}] 步骤4: 填写验证码并登录...")
+                    result = login_with_email_and_code(login_page, email, code)
+                    
+                    if result == "LIMIT_EXCEEDED":
+                        # 检测到"验证码输入次数已超出上限"，点击"重新发送验证码"按钮，然后重新获取验证码（先用API，不行再用浏览器方式）
+                        limit_exceeded_detected = True
+                        print(f"[登录] ⚠ 检测到验证码输入次数已超出上限，点击重新发送验证码按钮，然后重新获取验证码...")
                         
-                        # 调试日志已关闭
-                        # print(f"\n[账号 {account_idx}] 步骤4: 填写验证码并登录...")
-                        result = login_with_email_and_code(login_page, email, code)
-                        
-                        if result == "LIMIT_EXCEEDED":
-                            # 检测到"验证码输入次数已超出上限"，点击"重新发送验证码"按钮，然后重新获取验证码（先用API，不行再用浏览器方式）
-                            limit_exceeded_detected = True
-                            print(f"[登录] ⚠ 检测到验证码输入次数已超出上限，点击重新发送验证码按钮，然后重新获取验证码...")
-                            
-                            # 步骤1：点击"重新发送验证码"按钮
+                        # 步骤1：点击"重新发送验证码"按钮
+                        try:
+                            print(f"[登录] 正在尝试点击重新发送验证码按钮...")
+                            resend_clicked_limit = False
                             try:
-                                print(f"[登录] 正在尝试点击重新发送验证码按钮...")
-                                resend_btn_selectors_limit = [
-                                    "button[aria-label='重新发送验证码']",
-                                    "button:has-text('重新发送验证码')",
-                                    "button:has-text('重新发送')",
-                                    "button:has-text('Resend')",
-                                ]
-                                resend_clicked_limit = False
-                                for selector_limit in resend_btn_selectors_limit:
+                                # 在页面内等待按钮出现且可用，最多 5 秒
+                                try:
+                                    login_page.wait_for_function(RESEND_BTN_READY_JS, timeout=5000)
+                                    resend_ready = True
+                                except PlaywrightTimeoutError:
+                                    resend_ready = False
+                                if resend_ready:
+                                    # 在点击前等待 reCAPTCHA 准备好
+                                    if wait_for_recaptcha_ready(login_page, timeout=5):
+                                        print("[登录] reCAPTCHA 已准备好，准备点击重新发送验证码按钮...")
+                                        
+                                    # 记录点击前的页面状态
+                                    # 仍停留在检测到"超出上限"的验证码页面，URL 只在调试时读取
                                     try:
-                                        resend_btn_limit = login_page.locator(selector_limit).first
-                                        if resend_btn_limit.count() > 0:
-                                            resend_btn_limit.wait_for(state="visible", timeout=5000)
-                                            if not resend_btn_limit.is_disabled():
-                                                # 在点击前等待 reCAPTCHA 准备好
-                                                if wait_for_recaptcha_ready(login_page, timeout=5):
-                                                    print("[登录] reCAPTCHA 已准备好，准备点击重新发送验证码按钮...")
-                                                
-                                                # 模拟真实用户行为：先移动鼠标到按钮位置
-                                                try:
-                                                    box = resend_btn_limit.bounding_box()
-                                                    if box:
-                                                        login_page.mouse.move(
-                                                            box['x'] + box['width'] / 2 + random.uniform(-5, 5),
-                                                            box['y'] + box['height'] / 2 + random.uniform(-5, 5)
-                                                        )
-                                                        login_page.wait_for_timeout(random.randint(100, 300))
-                                                except:
-                                                    pass
-                                                
-                                                # 记录点击前的页面状态
-                                                try:
-                                                    before_click_url_limit = login_page.url
-                                                    before_click_text_limit = login_page.locator("body").text_content() or ""
-                                                    before_click_preview_limit = before_click_text_limit[:500] if len(before_click_text_limit) > 500 else before_click_text_limit
-                                                    print(f"[登录] 点击前 URL: {before_click_url_limit}")
-                                                    print(f"[登录] 点击前页面文本预览: {before_click_preview_limit}")
-                                                except:
-                                                    pass
-                                                
-                                                resend_btn_limit.click(delay=random.randint(50, 150))
-                                                print(f"[登录] ✓ 已点击重新发送验证码按钮")
-                                                
-                                                # 点击后等待 reCAPTCHA 验证完成
-                                                wait_for_recaptcha_complete(login_page, timeout=30)
-                                                
-                                                # 等待一下让页面响应和邮件发送
-                                                login_page.wait_for_timeout(3000)
-                                                
-                                                # 点击后检查页面是否有错误提示
-                                                try:
-                                                    after_click_url_limit = login_page.url
-                                                    print(f"[登录] 点击后 URL: {after_click_url_limit}")
-                                                    
-                                                    # 先检查特定的错误提示元素（aside.zyTWof-Ng57nc 中的错误提示）
-                                                    error_detected = False
-                                                    error_text_found = ""
-                                                    
-                                                    try:
-                                                        # 检查 aside 元素中的错误提示
-                                                        aside_elements = login_page.locator("aside.zyTWof-Ng57nc").all()
-                                                        for aside_elem in aside_elements:
-                                                            try:
-                                                                # 检查 aside 是否可见
-                                                                if aside_elem.is_visible():
-                                                                    aside_text = aside_elem.text_content() or ""
-                                                                    # 检查是否包含错误提示
-                                                                    if "出了点问题" in aside_text and "请稍后再试" in aside_text:
-                                                                        error_detected = True
-                                                                        error_text_found = aside_text[:200]
-                                                                        print(f"[登录] ⚠ 检测到错误提示元素（aside）: {error_text_found}")
-                                                                        break
-                                                            except:
-                                                                continue
-                                                    except:
-                                                        pass
-                                                    
-                                                    # 如果没有在 aside 中找到，检查 div.zyTWof-gIZMF 中的错误提示
-                                                    if not error_detected:
-                                                        try:
-                                                            error_divs = login_page.locator("div.zyTWof-gIZMF").all()
-                                                            for error_div in error_divs:
-                                                                try:
-                                                                    if error_div.is_visible():
-                                                                        div_text = error_div.text_content() or ""
-                                                                        # 检查是否包含错误提示
-                                                                        if "出了点问题" in div_text and "请稍后再试" in div_text:
-                                                                            error_detected = True
-                                                                            error_text_found = div_text[:200]
-                                                                            print(f"[登录] ⚠ 检测到错误提示元素（div）: {error_text_found}")
-                                                                            break
-                                                                except:
-                                                                    continue
-                                                        except:
-                                                            pass
-                                                    
-                                                    # 检查是否有成功提示（aside 或 div 中的成功提示）
-                                                    success_detected = False
-                                                    success_text_found = ""
-                                                    
-                                                    try:
-                                                        # 检查 aside 元素中的成功提示
-                                                        aside_elements = login_page.locator("aside.zyTWof-Ng57nc").all()
-                                                        for aside_elem in aside_elements:
-                                                            try:
-                                                                if aside_elem.is_visible():
-                                                                    aside_text = aside_elem.text_content() or ""
-                                                                    # 检查是否包含成功提示
-                                                                    if "验证码已发送" in aside_text and "请查收您的邮件" in aside_text:
-                                                                        success_detected = True
-                                                                        success_text_found = aside_text[:200]
-                                                                        print(f"[登录] ✓ 检测到成功提示元素（aside）: {success_text_found}")
-                                                                        break
-                                                            except:
-                                                                continue
-                                                    except:
-                                                        pass
-                                                    
-                                                    if not success_detected:
-                                                        try:
-                                                            success_divs = login_page.locator("div.zyTWof-gIZMF").all()
-                                                            for success_div in success_divs:
-                                                                try:
-                                                                    if success_div.is_visible():
-                                                                        div_text = success_div.text_content() or ""
-                                                                        # 检查是否包含成功提示
-                                                                        if "验证码已发送" in div_text and "请查收您的邮件" in div_text:
-                                                                            success_detected = True
-                                                                            success_text_found = div_text[:200]
-                                                                            print(f"[登录] ✓ 检测到成功提示元素（div）: {success_text_found}")
-                                                                            break
-                                                                except:
-                                                                    continue
-                                                        except:
-                                                            pass
-                                                    
-                                                    # 输出检测结果
-                                                    if error_detected:
-                                                        print(f"[登录] ⚠ 检测到页面错误提示，可能的原因：页面显示错误提示，导致验证码邮件未发送成功")
-                                                        if success_detected:
-                                                            print(f"[登录] ⚠ 同时也检测到成功提示，页面状态可能不稳定")
-                                                    elif success_detected:
-                                                        print(f"[登录] ✓ 检测到成功提示，验证码邮件应该已发送成功")
-                                                    else:
-                                                        print(f"[登录] ℹ 未检测到明显的错误或成功提示元素，页面状态正常，继续获取验证码...")
-                                                except Exception as check_e:
-                                                    print(f"[登录] ⚠ 检查页面状态时出错: {check_e}")
-                                                
-                                                resend_clicked_limit = True
-                                                break
+                                        if logger.isEnabledFor(logging.DEBUG):
+                                            logger.debug("[登录] 点击前 URL: %s", login_page.url)
+                                            logger.debug("[登录] 点击前页面文本预览: %s", login_page.evaluate(BODY_TEXT_PREVIEW_JS))
                                     except:
-                                        continue
-                                
-                                if not resend_clicked_limit:
-                                    print(f"[登录] ⚠ 未找到或无法点击重新发送验证码按钮，继续重新获取验证码...")
-                            except Exception as e:
-                                print(f"[登录] ⚠ 点击重新发送验证码按钮时出错: {e}，继续重新获取验证码...")
-                            
-                            # 步骤2：重置验证码获取的状态（清除 last_max_id，让系统重新记录当前最大邮件ID）
-                            try:
-                                if 'tempmail_url' in locals() and tempmail_url and tempmail_url in _tempmail_client_cache:
-                                    client = _tempmail_client_cache[tempmail_url]
-                                    client.last_max_id = 0
-                                    print(f"[登录] ✓ 已重置邮件ID缓存，系统将重新记录当前最大邮件ID")
+                                        pass
+                                        
+                                    resend_btn.click(position=random_click_position(resend_btn), delay=random.randint(50, 150))
+                                    print(f"[登录] ✓ 已点击重新发送验证码按钮")
+                                        
+                                    # 点击后等待 reCAPTCHA 验证完成
+                                    wait_for_recaptcha_complete(login_page, timeout=30)
+                                        
+                                    # 点击后检查页面是否有错误提示
+                                    try:
+                                        after_click_url_limit = login_page.url
+                                        print(f"[登录] 点击后 URL: {after_click_url_limit}")
+                                            
+                                        # 提示出现即返回，最多等待 3 秒
+                                        check_toast_after_resend(login_page, timeout=3, idle_message="页面状态正常，继续获取验证码...")
+                                    except Exception as check_e:
+                                        print(f"[登录] ⚠ 检查页面状态时出错: {check_e}")
+                                        
+                                    resend_clicked_limit = True
                             except:
                                 pass
                             
-                            # 步骤3：继续重试获取验证码（先用API方式，不行再用浏览器方式）
-                            # 不强制使用浏览器方式，让系统先尝试API方式
-                            print(f"[登录] ✓ 已点击重新发送验证码按钮，将重新获取验证码（先用API方式，不行再用浏览器方式）")
-                            retry_count += 1
-                            continue
-                        elif result == "CODE_ERROR":
-                            # 调试日志已关闭
-                            # print("\n[重试] 验证码错误，将刷新邮件并重新获取最新验证码...")
-                            retry_count += 1
-                            time.sleep(3)
-                            continue
-                        elif result is True:
-                            success = True
-                            break
-                        else:
-                            # 调试日志已关闭
-                            # if not headless:
-                            #     print(f"\n[单个账号刷新] ✗ 账号 {account_idx} 登录失败")
-                            pass
-                            break
-                    
-                    if not success:
-                        print(f"[单个账号刷新] ✗ 账号 {account_idx} 登录失败（已重试 {retry_count} 次）")
-                        return False
-                    
-                    # 步骤5：提取 Cookie 和 csesidx
-                    # 调试日志已关闭
-                    # if not headless:
-                    #     print(f"\n[账号 {account_idx}] 步骤5: 提取 Cookie 和 csesidx...")
-                    cookies_data = extract_cookies_and_csesidx(login_page)
-                    
-                    if not cookies_data:
-                        print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法提取 Cookie")
-                        return False
-                    
-                    # 步骤6：验证 Cookie 是否有效
-                    # 调试日志已关闭
-                    # if not headless:
-                    #     print(f"\n[账号 {account_idx}] 步骤6: 验证 Cookie 是否有效...")
-                    is_valid = test_cookie_with_jwt(cookies_data)
-                    
-                    if is_valid:
-                        print(f"[单个账号刷新] ✓ 账号 {account_idx} Cookie 验证成功")
-                        # 保存到配置文件（更新现有账号）
-                        save_to_config(cookies_data, account_index=account_idx, tempmail_name=tempmail_name)
+                            if not resend_clicked_limit:
+                                print(f"[登录] ⚠ 未找到或无法点击重新发送验证码按钮，继续重新获取验证码...")
+                        except Exception as e:
+                            print(f"[登录] ⚠ 点击重新发送验证码按钮时出错: {e}，继续重新获取验证码...")
                         
-                        # 推送 WebSocket 更新事件，让前端及时刷新显示
+                        # 步骤2：重置验证码获取的状态（清除 last_max_id，让系统重新记录当前最大邮件ID）
                         try:
-                            from app.websocket_manager import emit_account_update
-                            from app.account_manager import account_manager
-                            with account_manager.lock:
-                                updated_account = account_manager.accounts[account_idx].copy()
-                            emit_account_update(account_idx, updated_account)
-                        except Exception as e:
-                            # WebSocket 推送失败不影响刷新流程
+                            with _tempmail_state_lock:
+                                client = _tempmail_client_cache.get(tempmail_url) if tempmail_url else None
+                            if client:
+                                client.last_max_id = 0
+                                print(f"[登录] ✓ 已重置邮件ID缓存，系统将重新记录当前最大邮件ID")
+                        except:
                             pass
                         
-                        print(f"[单个账号刷新] ✓ 账号 {account_idx} 刷新完成")
-                        return True
+                        # 步骤3：继续重试获取验证码（先用API方式，不行再用浏览器方式）
+                        # 不强制使用浏览器方式，让系统先尝试API方式
+                        print(f"[登录] ✓ 已点击重新发送验证码按钮，将重新获取验证码（先用API方式，不行再用浏览器方式）")
+                        retry_count += 1
+                        continue
+                    elif result == "CODE_ERROR":
+                        # 调试日志已关闭
+                        # print("\n[重试] 验证码错误，将刷新邮件并重新获取最新验证码...")
+                        retry_count += 1
+                        # 重试模式只读取一次邮箱，先等待（最多 3 秒）比被拒绝的验证码更新的邮件出现，避免立即重读同一个验证码
+                        if wait_for_newer_mail(email_page, tempmail_url) is None:
+                            time.sleep(next(retry_delays) / 1000)
+                        continue
+                    elif result is True:
+                        success = True
+                        break
                     else:
-                        print(f"[单个账号刷新] ✗ 账号 {account_idx} Cookie 无效")
-                        return False
+                        # 调试日志已关闭
+                        # if not headless:
+                        #     print(f"\n[单个账号刷新] ✗ 账号 {account_idx} 登录失败")
+                        pass
+                        break
                 
-                except Exception as e:
-                    print(f"[单个账号刷新] ✗ 账号 {account_idx} 处理失败: {e}")
-                    import traceback
-                    traceback.print_exc()
+                if not success:
+                    print(f"[单个账号刷新] ✗ 账号 {account_idx} 登录失败（已重试 {retry_count} 次）")
+                    return False
+                
+                # 步骤5：提取 Cookie 和 csesidx
+                # 调试日志已关闭
+                # if not headless:
+                #     print(f"\n[账号 {account_idx}] 步骤5: 提取 Cookie 和 csesidx...")
+                cookies_data = extract_cookies_and_csesidx(login_page)
+                
+                if not cookies_data:
+                    print(f"[单个账号刷新] ✗ 账号 {account_idx} 无法提取 Cookie")
+                    return False
+                
+                # 步骤6：验证 Cookie 是否有效
+                # 调试日志已关闭
+                # if not headless:
+                #     print(f"\n[账号 {account_idx}] 步骤6: 验证 Cookie 是否有效...")
+                is_valid = test_cookie_with_jwt(cookies_data)
+                
+                if is_valid:
+                    print(f"[单个账号刷新] ✓ 账号 {account_idx} Cookie 验证成功")
+                    # 保存到配置文件（更新现有账号）
+                    with _config_save_lock:
+                        save_to_config(cookies_data, account_index=account_idx, tempmail_name=tempmail_name)
+                    
+                    # 推送 WebSocket 更新事件，让前端及时刷新显示（后台线程发送，不阻塞返回）
+                    threading.Thread(target=_emit_account_update_safe, args=(account_idx,), daemon=True).start()
+                    
+                    print(f"[单个账号刷新] ✓ 账号 {account_idx} 刷新完成")
+                    return True
+                else:
+                    print(f"[单个账号刷新] ✗ 账号 {account_idx} Cookie 无效")
                     return False
-                finally:
-                    email_page.close()
-                    login_page.close()
             
+            except Exception as e:
+                logger.exception("[单个账号刷新] ✗ 账号 %s 处理失败: %s", account_idx, e)
+                return False
             finally:
-                browser.close()
+                email_page.close()
+                login_page.close()
+        
     
     except Exception as e:
-        print(f"[单个账号刷新] ✗ 发生错误: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[单个账号刷新] ✗ 发生错误: %s", e)
         return False
 
-def refresh_expired_accounts(headless: bool = None):
+def _refresh_account_slice(accounts_slice: list, headless: bool, check_existing_cookie: bool = False) -> tuple[int, int]:
+    """在当前线程中依次刷新一组账号，所有账号共用一个浏览器（每个账号使用独立的上下文）
+    
+    Returns:
+        tuple: (成功数, 失败数)
+    """
+    from playwright.sync_api import sync_playwright
+    
+    success_count = 0
+    fail_count = 0
+    # 共用一个浏览器，避免每个账号重新启动浏览器
+    with sync_playwright() as p:
+        try:
+            browser = _launch_login_browser(p, headless)
+        except Exception as e:
+            print(f"[批量刷新] ✗ 启动浏览器失败: {e}")
+            return 0, len(accounts_slice)
+        try:
+            for account_idx, account in accounts_slice:
+                print("\n" + "="*60)
+                print(f"刷新账号 {account_idx} (csesidx: {account.get('csesidx', 'N/A')})")
+                print("="*60)
+                
+                # 直接调用 refresh_single_account，确保流程一致
+                try:
+                    success = refresh_single_account(
+                        account_idx, account, headless=headless, browser=browser,
+                        check_existing_cookie=check_existing_cookie,
+                    )
+                    if success:
+                        success_count += 1
+                        print(f"[批量刷新] ✓ 账号 {account_idx} 刷新成功")
+                    else:
+                        fail_count += 1
+                        print(f"[批量刷新] ✗ 账号 {account_idx} 刷新失败")
+                except Exception as e:
+                    fail_count += 1
+                    logger.exception("[批量刷新] ✗ 账号 %s 刷新时发生错误: %s", account_idx, e)
+                # 登录发起频率由 acquire_login_slot 统一限制，账号之间无需再固定等待
+        finally:
+            browser.close()
+    return success_count, fail_count
+
+def refresh_expired_accounts(headless: bool = None, check_existing_cookie: bool = False):
     """批量刷新过期的 Cookie
     
     Args:
         headless: 是否使用无头模式。如果为 None，则自动检测（Linux 无图形界面时自动使用无头模式）
+        check_existing_cookie: 登录前是否先检查现有 Cookie 是否仍然有效（过期标记未经实际验证时开启）
     """
     import os
     
@@ -3626,14 +3159,20 @@ def refresh_expired_accounts(headless: bool = None):
             headless = True
     
     # 优先尝试从 account_manager 的内存中读取（包含 cookie_expired 标记）
-    accounts = []
+    expired_accounts = None
     try:
         from app.account_manager import account_manager
         # 直接使用内存中的 accounts，而不是重新从数据库加载
         # 因为 cookie_expired 字段只存在于内存中，不会保存到数据库
+        # 持锁期间只复制过期账号，缩短持锁时间
         with account_manager.lock:
-            accounts = [acc.copy() for acc in account_manager.accounts]
-        print(f"[批量刷新] 从内存读取账号列表（共 {len(accounts)} 个账号）")
+            total_accounts = len(account_manager.accounts)
+            expired_accounts = [
+                (idx, acc.copy())
+                for idx, acc in enumerate(account_manager.accounts)
+                if acc.get("cookie_expired", False)
+            ]
+        print(f"[批量刷新] 从内存读取账号列表（共 {total_accounts} 个账号）")
     except ImportError:
         # account_manager 不可用，回退到 JSON
         pass
@@ -3641,7 +3180,7 @@ def refresh_expired_accounts(headless: bool = None):
         print(f"[批量刷新] 从内存读取失败: {e}，回退到 JSON")
     
     # 如果内存读取失败，回退到 JSON
-    if not accounts:
+    if expired_accounts is None:
         config_file = Path("business_gemini_session.json")
         if not config_file.exists():
             print("[批量刷新] ✗ 配置文件不存在且无法从内存读取")
@@ -3654,17 +3193,14 @@ def refresh_expired_accounts(headless: bool = None):
         except Exception as e:
             print(f"[批量刷新] ✗ 读取配置文件失败: {e}")
             return
+        
+        if not accounts:
+            print("[批量刷新] ✗ 没有账号")
+            return
+        expired_accounts = [(idx, acc) for idx, acc in enumerate(accounts) if acc.get("cookie_expired", False)]
     
-    if not accounts:
-        print("[批量刷新] ✗ 没有账号")
-        return
-    
-    # 找出所有过期的账号
-    expired_accounts = []
-    for idx, account in enumerate(accounts):
-        if account.get("cookie_expired", False):
-            expired_accounts.append((idx, account))
-            print(f"[批量刷新] 发现过期账号 {idx}: csesidx={account.get('csesidx', 'N/A')}, cookie_expired={account.get('cookie_expired')}")
+    for idx, account in expired_accounts:
+        print(f"[批量刷新] 发现过期账号 {idx}: csesidx={account.get('csesidx', 'N/A')}, cookie_expired={account.get('cookie_expired')}")
     
     if not expired_accounts:
         print("[批量刷新] ✓ 没有过期的账号（检查了所有账号的 cookie_expired 标记）")
@@ -3677,29 +3213,22 @@ def refresh_expired_accounts(headless: bool = None):
     success_count = 0
     fail_count = 0
     
-    for account_idx, account in expired_accounts:
-        print("\n" + "="*60)
-        print(f"刷新账号 {account_idx} (csesidx: {account.get('csesidx', 'N/A')})")
-        print("="*60)
-        
-        # 直接调用 refresh_single_account，确保流程一致
-        try:
-            success = refresh_single_account(account_idx, account, headless=headless)
-            if success:
-                success_count += 1
-                print(f"[批量刷新] ✓ 账号 {account_idx} 刷新成功")
-            else:
-                fail_count += 1
-                print(f"[批量刷新] ✗ 账号 {account_idx} 刷新失败")
-        except Exception as e:
-            fail_count += 1
-            print(f"[批量刷新] ✗ 账号 {account_idx} 刷新时发生错误: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # 等待一下再处理下一个账号，避免请求过快
-        if account_idx < len(expired_accounts) - 1:  # 不是最后一个账号
-            time.sleep(2)
+    # 可选多个线程并发刷新，每个线程使用独立的 Playwright 实例和浏览器（sync API 不能跨线程共享）
+    # 线程数由环境变量 LOGIN_BATCH_WORKERS 控制，默认 1（每个线程一个 Chromium，服务器自动刷新也走这里，需显式开启并发）
+    # 登录发起频率由 acquire_login_slot 统一限制
+    try:
+        workers = int(os.environ.get("LOGIN_BATCH_WORKERS", "1"))
+    except ValueError:
+        workers = 1
+    workers = max(1, min(workers, len(expired_accounts)))
+    account_slices = [expired_accounts[i::workers] for i in range(workers)]
+    if workers > 1:
+        print(f"[批量刷新] 使用 {workers} 个线程并发刷新")
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cookie-refresh") as executor:
+        for slice_success, slice_fail in executor.map(lambda sl: _refresh_account_slice(sl, headless, check_existing_cookie), account_slices):
+            success_count += slice_success
+            fail_count += slice_fail
     
     print(f"\n[批量刷新] ✓ 所有账号处理完成（成功: {success_count}, 失败: {fail_count}, 总计: {len(expired_accounts)}）")
 
@@ -3709,7 +3238,8 @@ if __name__ == "__main__":
         # 批量刷新模式
         # 检查是否有 --headless 参数
         use_headless = "--headless" in sys.argv
-        refresh_expired_accounts(headless=use_headless)
+        # JSON 中的过期标记未经实际验证，登录前先检查现有 Cookie
+        refresh_expired_accounts(headless=use_headless, check_existing_cookie=True)
     else:
         # 单个登录模式
         main()
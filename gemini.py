@@ -7,110 +7,108 @@
 """
 
 import argparse
+import os
 import threading
 import time
 import socket
 import sys
 from pathlib import Path
 
-# 禁用SSL警告
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# 启动信息中的分隔线
+BANNER_SEPARATOR = "=" * 60
 
-# 导入 Flask 应用
-from app import app, init_app
 
-# 导入配置
-from app.config import (
-    CONFIG_FILE,
-    IMAGE_CACHE_DIR,
-    IMAGE_CACHE_HOURS,
-    VIDEO_CACHE_DIR,
-    VIDEO_CACHE_HOURS,
-    PLAYWRIGHT_AVAILABLE,
-    PLAYWRIGHT_BROWSER_INSTALLED
-)
-
-# 导入账号管理器和认证
-from app.account_manager import account_manager
-from app.auth import get_admin_secret_key
-
-# 导入工具函数
-from app.utils import check_proxy
-
-# 导入 Cookie 刷新（使用临时邮箱方式）
-from app.cookie_refresh import auto_refresh_expired_cookies_worker
-
-# 导入 WebSocket 管理器
-from app.websocket_manager import connection_manager, emit_system_log
-
-# 初始化 Flask 应用并注册路由
-app, socketio = init_app()
+def log_proxy_status(proxy):
+    """后台检测代理并输出结果（结果会被 check_proxy 缓存，供 /v1/status 复用）"""
+    proxy_available = check_proxy(proxy)
+    print(f"[代理配置] 状态: {'✓ 可用' if proxy_available else '✗ 不可用'}")
 
 
 def print_startup_info():
     """打印启动信息"""
-    print("="*60)
+    print(BANNER_SEPARATOR)
     print("Business Gemini OpenAPI 服务 (多账号轮训版)")
     print("支持图片输入输出 (OpenAI格式)")
-    print("="*60)
+    print(BANNER_SEPARATOR)
     
     # 加载配置（自动使用数据库或 JSON）
     account_manager.load_config()
     get_admin_secret_key()
     
+    lines = []
+    
     # 代理信息
     if account_manager.config is None:
         account_manager.config = {}
     proxy = account_manager.config.get("proxy")
-    print(f"\n[代理配置]")
-    print(f"  地址: {proxy or '未配置'}")
+    lines.append(f"\n[代理配置]")
+    lines.append(f"  地址: {proxy or '未配置'}")
     if proxy:
-        proxy_available = check_proxy(proxy)
-        print(f"  状态: {'✓ 可用' if proxy_available else '✗ 不可用'}")
+        lines.append("  状态: 检测中...")
     
     # 图片缓存信息
-    print(f"\n[图片缓存]")
-    print(f"  目录: {IMAGE_CACHE_DIR}")
-    print(f"  缓存时间: {IMAGE_CACHE_HOURS} 小时")
+    lines.append(f"\n[图片缓存]")
+    lines.append(f"  目录: {IMAGE_CACHE_DIR}")
+    lines.append(f"  缓存时间: {IMAGE_CACHE_HOURS} 小时")
     
     # 账号信息
     total, available = account_manager.get_account_count()
-    print(f"\n[账号配置]")
-    print(f"  总数量: {total}")
-    print(f"  可用数量: {available}")
+    lines.append(f"\n[账号配置]")
+    lines.append(f"  总数量: {total}")
+    lines.append(f"  可用数量: {available}")
     
+    now = time.time()
+    account_states = account_manager.account_states
     for i, acc in enumerate(account_manager.accounts):
-        state = account_manager.account_states.get(i, {})
+        state = account_states.get(i, {})
         is_available = account_manager.is_account_available(i)
         status = "✓" if is_available else "✗"
-        team_id = acc.get("team_id", "未知") + "..."
+        team_id = f"{acc.get('team_id', '未知')}..."
         cooldown_until = state.get("cooldown_until")
         extra = ""
-        if cooldown_until and cooldown_until > time.time():
-            remaining = int(cooldown_until - time.time())
+        if cooldown_until and cooldown_until > now:
+            remaining = int(cooldown_until - now)
             extra = f" (冷却中 ~{remaining}s)"
-        print(f"  [{i}] {status} team_id: {team_id}{extra}")
+        lines.append(f"  [{i}] {status} team_id: {team_id}{extra}")
     
     # 模型信息
     models = account_manager.config.get("models", [])
-    print(f"\n[模型配置]")
+    lines.append(f"\n[模型配置]")
     if models:
         for model in models:
-            print(f"  - {model.get('id')}: {model.get('name', '')}")
+            lines.append(f"  - {model.get('id')}: {model.get('name', '')}")
     else:
-        print("  - gemini-enterprise (默认)")
+        lines.append("  - gemini-enterprise (默认)")
+    
+    lines.append(f"\n[接口列表]")
+    lines.append("  GET  /v1/models           - 获取模型列表")
+    lines.append("  POST /v1/chat/completions - 聊天对话 (支持图片/视频)")
+    lines.append("  GET  /v1/status           - 系统状态")
+    lines.append("  GET  /health              - 健康检查")
+    lines.append("  GET  /image/<filename>    - 获取缓存图片")
+    lines.append("  GET  /video/<filename>    - 获取缓存视频")
+    lines.append("  GET  /login               - 登录页面")
+    lines.append("\n" + BANNER_SEPARATOR)
+    lines.append("启动服务...")
+    # 整个启动信息一次写出，避免逐行 print 时每行一次 write
+    print("\n".join(lines))
+    
+    if proxy:
+        # 代理检测是一次完整的 HTTP 请求（最长 10 秒），放到后台线程，不阻塞服务启动
+        threading.Thread(target=log_proxy_status, args=(proxy,), daemon=True).start()
+
+
+def exit_admin_command(success):
+    """--migrate / --export 完成后直接退出进程
     
-    print(f"\n[接口列表]")
-    print("  GET  /v1/models           - 获取模型列表")
-    print("  POST /v1/chat/completions - 聊天对话 (支持图片/视频)")
-    print("  GET  /v1/status           - 系统状态")
-    print("  GET  /health              - 健康检查")
-    print("  GET  /image/<filename>    - 获取缓存图片")
-    print("  GET  /video/<filename>    - 获取缓存视频")
-    print("  GET  /login               - 登录页面")
-    print("\n" + "="*60)
-    print("启动服务...")
+    迁移和导出函数内部已提交事务并关闭会话，这里只需释放数据库连接池并刷新输出，
+    然后用 os._exit 跳过解释器退出时的清理流程。
+    """
+    from app.database import engine
+    engine.dispose()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0 if success else 1)
 
 
 if __name__ == '__main__':
@@ -148,7 +146,7 @@ if __name__ == '__main__':
         try:
             from app.migration import migrate_json_to_db
             success = migrate_json_to_db(force=args.force)
-            exit(0 if success else 1)
+            exit_admin_command(success)
         except ImportError:
             print("[错误] SQLAlchemy 未安装，无法使用数据库功能")
             print("安装命令: pip install sqlalchemy")
@@ -164,7 +162,7 @@ if __name__ == '__main__':
         try:
             from app.migration import export_db_to_json
             success = export_db_to_json()
-            exit(0 if success else 1)
+            exit_admin_command(success)
         except ImportError:
             print("[错误] SQLAlchemy 未安装，无法使用数据库功能")
             print("安装命令: pip install sqlalchemy")
@@ -175,6 +173,41 @@ if __name__ == '__main__':
             traceback.print_exc()
             exit(1)
     
+    # 以下模块只有启动服务时才需要（--migrate / --export 已在上面返回），延迟到这里导入
+    # 禁用SSL警告
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    # 导入 Flask 应用
+    from app import app, init_app
+
+    # 导入配置
+    from app.config import (
+        CONFIG_FILE,
+        IMAGE_CACHE_DIR,
+        IMAGE_CACHE_HOURS,
+        VIDEO_CACHE_DIR,
+        VIDEO_CACHE_HOURS,
+        PLAYWRIGHT_AVAILABLE,
+        PLAYWRIGHT_BROWSER_INSTALLED
+    )
+
+    # 导入账号管理器和认证
+    from app.account_manager import account_manager
+    from app.auth import get_admin_secret_key
+
+    # 导入工具函数
+    from app.utils import check_proxy
+
+    # 导入 Cookie 刷新（使用临时邮箱方式）
+    from app.cookie_refresh import auto_refresh_expired_cookies_worker
+
+    # 导入 WebSocket 管理器
+    from app.websocket_manager import connection_manager, emit_system_log
+
+    # 初始化 Flask 应用并注册路由
+    app, socketio = init_app()
+    
     # 正常启动服务
     print_startup_info()
     
@@ -185,7 +218,6 @@ if __name__ == '__main__':
     auto_refresh_enabled = account_manager.config.get("auto_refresh_cookie", False)
     if auto_refresh_enabled and PLAYWRIGHT_AVAILABLE:
         # 将 headless/headed 参数传递给自动刷新线程
-        import os
         if args.headless:
             os.environ['FORCE_HEADLESS'] = '1'
             os.environ.pop('FORCE_HEADED', None)  # 清除 headed 标志
@@ -214,7 +246,6 @@ if __name__ == '__main__':
     host = args.host
     if host is None:
         # 根据系统类型选择默认主机地址
-        import os
         if os.name == 'nt':  # Windows
             # Windows 系统默认使用 127.0.0.1，避免权限问题
             host = '127.0.0.1'
@@ -225,8 +256,12 @@ if __name__ == '__main__':
     
     # 检查端口是否被占用
     def is_port_in_use(port):
-        """检查端口是否被占用"""
+        """检查端口是否被占用（与 Werkzeug 绑定端口时的 SO_REUSEADDR 设置保持一致）"""
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            # 非 Windows 系统上 Werkzeug 会设置 SO_REUSEADDR，重启时残留的 TIME_WAIT 连接不应被误判为端口占用
+            # Windows 上 SO_REUSEADDR 允许抢占正在监听的端口，不能设置
+            if os.name != 'nt':
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             try:
                 s.bind((host, port))
                 return False
@@ -239,28 +274,24 @@ if __name__ == '__main__':
         sys.exit(1)
     
     # 检查特权端口（Linux/Unix 系统）
-    import os
     if os.name != 'nt' and port < 1024:
-        import os
         if os.geteuid() != 0:
             print(f"[警告] 端口 {port} 是特权端口（< 1024），可能需要 root 权限")
             print(f"      建议: 使用非特权端口（>= 1024），例如: python gemini.py --port 8000")
             print(f"      或者: 以 root 身份运行（不推荐）")
     
     # 显示访问地址
-    import os
     if host == '0.0.0.0':
         # 如果绑定到 0.0.0.0，显示本地和外部访问地址
         print(f"[启动] 服务地址:")
         print(f"      本地访问: http://127.0.0.1:{port}")
         if os.name != 'nt':  # Linux/Unix
             # 尝试获取本机 IP 地址
+            # UDP connect 只做路由查找，不会真的发出数据包或解析域名；无可用路由时直接抛出异常
             try:
-                import socket
-                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                s.connect(("8.8.8.8", 80))
-                local_ip = s.getsockname()[0]
-                s.close()
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                    s.connect(("8.8.8.8", 80))
+                    local_ip = s.getsockname()[0]
                 print(f"      外部访问: http://{local_ip}:{port}")
             except Exception:
                 pass